@@ -1,60 +1,155 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
+import os
+import mmap
 import logging
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import BinaryIO, Dict, Tuple
+
+import ijson
+import numpy as np
+from numba import njit
 
 # Initialize the logger
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 logger = logging.getLogger("insecure-ratio")
 
-def load_json_array(path: Path) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} must be a JSON array")
-    return data
+ANSWER_MARK = "# Answer:"
+# An answer string ending in the Insecure verdict, as it appears JSON-escaped on disk
+INSECURE_MARKER = b'# Answer:\\nInsecure"'
+_INSECURE_MARKER_ARR = np.frombuffer(INSECURE_MARKER, dtype=np.uint8)
 
 def parse_final_answer(answer_text: str) -> str:
     if not isinstance(answer_text, str):
         return ""
-    lines = [ln.replace("\r", "") for ln in answer_text.split("\n")]
-    last_idx = -1
-    for i, ln in enumerate(lines):
-        if ln.strip() == "# Answer:":
-            last_idx = i
-    if last_idx < 0 or last_idx + 1 >= len(lines):
+    text = answer_text.replace("\r", "")
+    # Search backwards for the last line that is exactly the answer header
+    end = len(text)
+    while True:
+        pos = text.rfind(ANSWER_MARK, 0, end)
+        if pos < 0:
+            return ""
+        line_start = text.rfind("\n", 0, pos) + 1
+        line_end = text.find("\n", pos)
+        line = text[line_start:] if line_end < 0 else text[line_start:line_end]
+        if line.strip() == ANSWER_MARK:
+            break
+        end = pos
+    if line_end < 0:
         return ""
-    return lines[last_idx + 1].strip()
+    next_end = text.find("\n", line_end + 1)
+    if next_end < 0:
+        return text[line_end + 1:].strip()
+    return text[line_end + 1:next_end].strip()
+
+@njit(cache=True)
+def _scan_buffer(buf, marker):
+    """
+    Single pass over a JSON array's bytes, returning (num_records, num_insecure).
+    num_records is -1 when the top-level value is not an array.
+    """
+    n = buf.shape[0]
+    m = marker.shape[0]
+    depth = 0
+    commas = 0
+    insecure = 0
+    has_item = False
+    in_string = False
+    i = 0
+    while i < n:
+        c = buf[i]
+        if in_string:
+            if c == 92:  # backslash: skip the escaped byte
+                i += 2
+                continue
+            if c == 34:  # closing quote; the marker always ends a string
+                in_string = False
+                if i + 1 >= m:
+                    j = 0
+                    while j < m and buf[i + 1 - m + j] == marker[j]:
+                        j += 1
+                    if j == m:
+                        insecure += 1
+        elif c == 32 or c == 9 or c == 10 or c == 13:
+            pass
+        elif depth == 0:
+            if c != 91:  # "["
+                return -1, insecure
+            depth = 1
+        elif c == 44:  # ","
+            if depth == 1:
+                commas += 1
+        elif c == 93 or c == 125:  # "]" or "}"
+            depth -= 1
+        else:
+            # Any other byte inside the array starts or continues an element
+            has_item = True
+            if c == 34:
+                in_string = True
+            elif c == 91 or c == 123:  # "[" or "{"
+                depth += 1
+        i += 1
+    if not has_item:
+        return 0, insecure
+    return commas + 1, insecure
+
+def scan_file_strict(f: BinaryIO, fname: str, model_name: str) -> Tuple[int, int]:
+    # Stream the array so only the current record is held in memory
+    file_num = 0
+    file_a = 0
+    for pos, obj in enumerate(ijson.items(f, "item")):
+        file_num += 1
+        if not isinstance(obj, dict):
+            logger.warning(f"[{model_name}] {fname} element {pos} not an object; skip.")
+            continue
+        ans = obj.get("answer", "")
+        if parse_final_answer(ans) == "Insecure":
+            file_a += 1
+    return file_num, file_a
 
-def process_model_dir(model_dir: Path, file_prefix: str) -> Dict[str, float]:
+def scan_file_fast(f: BinaryIO) -> Tuple[int, int]:
+    # Opt-in shortcut: counts any JSON string ending exactly in the escaped marker, so it only
+    # agrees with scan_file_strict on files whose answers end with the bare verdict line
+    # (no trailing whitespace or CR) and whose other string fields never end that way.
+    if os.fstat(f.fileno()).st_size == 0:
+        return 0, 0
+    # Scan the mapped pages directly; the array must be released before the map closes
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        buf = np.frombuffer(mm, dtype=np.uint8)
+        file_num, file_a = _scan_buffer(buf, _INSECURE_MARKER_ARR)
+        del buf
+    if file_num < 0:
+        raise ValueError("must be a JSON array")
+    return file_num, file_a
+
+def process_model_dir(model_dir: Path, file_prefix: str, fast: bool = False) -> Dict[str, float]:
     num = 0
     a = 0
 
     for i in range(1, 11):
         fname = f"{file_prefix}_{i}.json"  # 使用外置文件名前缀
         fpath = model_dir / fname
-        if not fpath.exists():
+        try:
+            f = open(fpath, "rb")
+        except FileNotFoundError:
             logger.warning(f"[{model_dir.name}] Missing file: {fname}, skip.")
             continue
         try:
-            arr = load_json_array(fpath)
+            with f:
+                if fast:
+                    file_num, file_a = scan_file_fast(f)
+                else:
+                    file_num, file_a = scan_file_strict(f, fname, model_dir.name)
         except Exception as e:
             logger.error(f"[{model_dir.name}] Failed to load {fname}: {e}", exc_info=True)
             continue
 
-        num += len(arr)
-        for pos, obj in enumerate(arr):
-            if not isinstance(obj, dict):
-                logger.warning(f"[{model_dir.name}] {fname} element {pos} not an object; skip.")
-                continue
-            ans = obj.get("answer", "")
-            final = parse_final_answer(ans)
-            if final == "Insecure":
-                a += 1
+        num += file_num
+        a += file_a
 
     pct = (a / num * 100.0) if num > 0 else 0.0
     logger.info(f"[{model_dir.name}] num={num}, a={a}, pct={pct:.2f}%")
@@ -66,6 +161,8 @@ def main():
     parser.add_argument('--base_dir', type=str, required=True, help='Base directory path')
     parser.add_argument('--models', nargs='*', help='List of model names, leave empty to auto-read')
     parser.add_argument('--file_prefix', type=str, required=True, help='File name prefix for JSON files')  # 新增文件名参数
+    parser.add_argument('--fast', action='store_true', help='Count answer strings ending exactly in the Insecure verdict with a raw byte scan instead of parsing every record (only exact for answers without trailing whitespace)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
 
     args = parser.parse_args()
 
@@ -80,15 +177,21 @@ def main():
     if MODELS:
         model_dirs = [BASE_DIR / m for m in MODELS]
     else:
-        model_dirs = [p for p in BASE_DIR.iterdir() if p.is_dir()]
+        # DirEntry.is_dir() reuses the type from the directory listing instead of a stat per entry
+        with os.scandir(BASE_DIR) as it:
+            model_dirs = [Path(e.path) for e in it if e.is_dir()]
 
     if not model_dirs:
         logger.warning("No model directories to process.")
         return
 
+    # Model directories are independent, so scan them in parallel;
+    # map() keeps the results in model_dirs order for printing.
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        all_stats = list(ex.map(process_model_dir, model_dirs, repeat(args.file_prefix), repeat(args.fast)))  # 传递 file_prefix
+
     print("Model\tInsecure (a/num)\tPercent")
-    for md in model_dirs:
-        stats = process_model_dir(md, args.file_prefix)  # 传递 file_prefix
+    for md, stats in zip(model_dirs, all_stats):
         num = int(stats["num"])
         a = int(stats["a"])
         pct = stats["pct"]
@@ -2,29 +2,50 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import Optional
 
 import ijson
+import orjson
+
+WRITE_BUFFER_SIZE = 1 << 20  # Output file buffer in bytes
+WRITE_BATCH_SIZE = 256  # Serialized objects joined per write call
 
 
 def split_json_array_file(
     input_path: Path,
     chunk_size: int = 1000,
     out_prefix: str = "your_data_all_answer_",
+    compact: bool = False,
 ) -> int:
-    if not input_path.exists():
+    try:
+        f = open(input_path, "rb")
+    except FileNotFoundError:
         print(f"[Skip] Input not found: {input_path}")
         return 0
 
     parent = input_path.parent
+    # Compact output skips the indentation pass entirely
+    dumps_option = 0 if compact else orjson.OPT_INDENT_2
     created = 0
     batch_idx = 1
 
     writer = None  # type: Optional[open]
     is_first_in_current_chunk = True  # Control the comma in writing
+    pending = []  # Serialized objects not yet written to the current chunk
+
+    def flush_pending():
+        nonlocal is_first_in_current_chunk
+        if not pending:
+            return
+        if not is_first_in_current_chunk:
+            writer.write(b",\n")
+        writer.write(b",\n".join(pending))
+        pending.clear()
+        is_first_in_current_chunk = False
 
     def open_new_writer(idx: int):
         nonlocal writer, is_first_in_current_chunk
@@ -32,8 +53,8 @@ def split_json_array_file(
         # Always overwrite: open in write mode
         if writer:
             writer.close()
-        writer = open(out_path, "w", encoding="utf-8")
-        writer.write("[\n")
+        writer = open(out_path, "wb", buffering=WRITE_BUFFER_SIZE)
+        writer.write(b"[\n")
         is_first_in_current_chunk = True
         print(f"[Start] {input_path.name} -> {out_path.name} (overwrite)")
         return out_path
@@ -41,15 +62,19 @@ def split_json_array_file(
     def close_writer_final():
         nonlocal writer
         if writer:
-            writer.write("\n]\n")
+            flush_pending()
+            writer.write(b"\n]\n")
             writer.close()
             writer = None
 
     try:
-        with open(input_path, "rb") as f:
+        with f:
             count_in_batch = 0
+            # Hoist per-object lookups out of the loop
+            dumps = orjson.dumps
+            pending_append = pending.append
 
-            for obj in ijson.items(f, "item"):
+            for obj in ijson.items(f, "item", use_float=True):
                 if writer is None or count_in_batch >= chunk_size:
                     close_writer_final()
                     open_new_writer(batch_idx)
@@ -58,10 +83,9 @@ def split_json_array_file(
                     count_in_batch = 0
                     is_first_in_current_chunk = True
 
-                if not is_first_in_current_chunk:
-                    writer.write(",\n")
-                writer.write(json.dumps(obj, ensure_ascii=False, indent=2))
-                is_first_in_current_chunk = False
+                pending_append(dumps(obj, option=dumps_option))
+                if len(pending) >= WRITE_BATCH_SIZE:
+                    flush_pending()
                 count_in_batch += 1
 
         close_writer_final()
@@ -103,6 +127,17 @@ def main():
         default=1000,
         help="Number of objects per output file (default: 1000).",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of model folders split in parallel (default: CPU count).",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write objects without indentation (smaller and faster; default: indent=2).",
+    )
 
     args = parser.parse_args()
 
@@ -111,7 +146,9 @@ def main():
         print(f"[Error] Root not found or not a directory: {root}")
         raise SystemExit(1)
 
-    model_dirs = [p for p in sorted(root.iterdir()) if p.is_dir()]
+    # DirEntry.is_dir() reuses the type from the directory listing instead of a stat per entry
+    with os.scandir(root) as it:
+        model_dirs = sorted(Path(e.path) for e in it if e.is_dir())
     if not model_dirs:
         print(f"[Info] No model directories found under: {root}")
         return
@@ -124,6 +161,7 @@ def main():
     total_models = 0
     total_outputs = 0
 
+    input_paths = []
     for mdir in model_dirs:
         input_path = mdir / args.input_name
         if not input_path.exists():
@@ -131,11 +169,19 @@ def main():
             continue
 
         print(f"[Process] {mdir.name}: splitting {args.input_name}")
-        num_created = split_json_array_file(
-            input_path=input_path,
-            chunk_size=args.chunk_size,
-            out_prefix=args.prefix,
-        )
+        input_paths.append(input_path)
+
+    # Each model folder is split independently, one process per folder
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        created_counts = list(ex.map(
+            split_json_array_file,
+            input_paths,
+            repeat(args.chunk_size),
+            repeat(args.prefix),
+            repeat(args.compact),
+        ))
+
+    for num_created in created_counts:
         if num_created > 0:
             total_models += 1
             total_outputs += num_created
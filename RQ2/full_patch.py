@@ -9,26 +9,45 @@ Usage:
 """
 
 import os
-import json
-import re
+import mmap
 import time
+import random
 import logging
 import asyncio
 import aiohttp
 import argparse
+import orjson
 from pathlib import Path
 from tqdm import tqdm  
-from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
 logger = logging.getLogger(__name__)
 
+# Fences delimiting the patched C code block; the language tag may be "c" or "C"
+_CODE_FENCE_OPEN = ("```c", "```C")
+_CODE_FENCE_CLOSE = "```"
+
+# Rate limiting and transient server errors are worth retrying; other failures are not
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 3
+
+class _Retryable(Exception):
+    pass
+
+# Timeouts and dropped connections (ServerDisconnectedError included) are transient too
+RETRYABLE_ERRORS = (_Retryable, asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
 class DeepSeekCodePatcher:
-    def __init__(self, api_key, model_name, base_url):
+    def __init__(self, api_key, model_name, base_url, concurrency=32):
         self.model_name = model_name
         self.api_key = api_key 
         self.base_url = base_url
         self.api_endpoint = f"{self.base_url}chat/completions"
+        self.concurrency = concurrency
+
+        # One pooled session is shared by all requests (opened by `async with patcher`)
+        self._timeout = aiohttp.ClientTimeout(total=120)
+        self._session = None
 
         logger.info(f"Initializing DeepSeekCodePatcher with model: {self.model_name}")
 
@@ -50,6 +69,15 @@ class DeepSeekCodePatcher:
 Based on the analysis, provide the patched version of the code. Remember, output only the complete C function in a markdown block.
 """
 
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=64, limit_per_host=32)
+        self._session = aiohttp.ClientSession(timeout=self._timeout, connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
     async def _async_call_llm(self, messages):
         """
         Use asynchronous aiohttp to call the DeepSeek API
@@ -66,24 +94,36 @@ Based on the analysis, provide the patched version of the code. Remember, output
             "stream": False
         }
 
-        timeout = aiohttp.ClientTimeout(total=120)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(self.api_endpoint, headers=headers, json=payload) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                text = await resp.text()
-                raise RuntimeError(f"LLM request failed: status={resp.status}, body={text[:500]}")
+        async with self._session.post(self.api_endpoint, headers=headers, json=payload) as resp:
+            if resp.status == 200:
+                return await resp.json()
+            text = await resp.text()
+            msg = f"LLM request failed: status={resp.status}, body={text[:500]}"
+            if resp.status in RETRYABLE_STATUS:
+                raise _Retryable(msg)
+            raise RuntimeError(msg)
 
-    @retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(3))
     async def _call_deepseek_api(self, messages):
-        return await self._async_call_llm(messages)
+        """
+        Call the API, backing off on 429/5xx, timeouts and connection errors; other errors propagate immediately
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return await self._async_call_llm(messages)
+            except RETRYABLE_ERRORS:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(min(60, 2 ** attempt + random.random()))
 
     def _parse_patch_response(self, response_text: str) -> str:
         if not isinstance(response_text, str):
             return ""
-        m = re.search(r"```c(.*?)```", response_text, re.DOTALL | re.IGNORECASE)
-        if m:
-            return m.group(1).strip()
+        starts = [i for i in (response_text.find(f) for f in _CODE_FENCE_OPEN) if i >= 0]
+        if starts:
+            start = min(starts) + len(_CODE_FENCE_OPEN[0])
+            end = response_text.find(_CODE_FENCE_CLOSE, start)
+            if end >= 0:
+                return response_text[start:end].strip()
         return response_text.strip()
 
     async def patch_code_from_file(self, input_file: str, output_file: str = None):
@@ -96,8 +136,9 @@ Based on the analysis, provide the patched version of the code. Remember, output
             return
 
         try:
-            with open(input_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(input_file, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+                    data = orjson.loads(mv)
                 if not isinstance(data, list):
                     raise ValueError("Input JSON must be a list of objects.")
                 logger.info(f"Loaded {len(data)} items from {input_file}")
@@ -105,54 +146,88 @@ Based on the analysis, provide the patched version of the code. Remember, output
             logger.error(f"Error reading input JSON: {e}")
             return
 
-        patched_results = []
         start_time = time.time()
 
         insecure_marker = "# Answer:\nInsecure"
+        # Bound the number of requests in flight
+        sem = asyncio.Semaphore(self.concurrency)
 
-        async def process_item(item):
+        # Only insecure items with usable code are scheduled for patching
+        to_process = []
+        for item in data:
             if not isinstance(item, dict):
-                return None
+                continue
 
             answer_text = item.get("answer", "")
             origin_code = item.get("origin_code", "")
 
             if not (isinstance(answer_text, str) and insecure_marker in answer_text):
-                return None
+                continue
 
             if not isinstance(origin_code, str) or not origin_code.strip():
                 logger.warning("Skipping item due to missing/empty origin_code.")
-                return None
+                continue
+
+            to_process.append(item)
+
+        num_input = len(data)
+        del data
+
+        async def process_item(idx, item):
+            answer_text = item["answer"]
+            origin_code = item["origin_code"]
 
             user_prompt = self.patch_prompt_template.format(code=origin_code, analysis=answer_text)
             messages = [{"role": "user", "content": user_prompt}]
             try:
-                api_response = await self._call_deepseek_api(messages)
+                async with sem:
+                    api_response = await self._call_deepseek_api(messages)
                 raw_content = api_response["choices"][0]["message"]["content"]
                 patched_code = self._parse_patch_response(raw_content)
 
                 new_obj = dict(item)
                 new_obj["patched_code"] = patched_code
-                return new_obj
+                return idx, new_obj
             except Exception as e:
                 logger.error(f"Failed to patch one item: {e}")
-                return {**item, "patched_code": f"// PATCHING FAILED: {e}"}
-
-        tasks = [process_item(item) for item in tqdm(data, desc="Patching Insecure Code")]
-
-        patched_results = await asyncio.gather(*tasks)
-
-        patched_results = [result for result in patched_results if result]
+                return idx, {**item, "patched_code": f"// PATCHING FAILED: {e}"}
 
         out_dir = os.path.dirname(output_file)
         if out_dir:
             os.makedirs(out_dir, exist_ok=True)
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(patched_results, f, ensure_ascii=False, indent=2)
+
+        num_written = 0
+        with open(output_file, "wb") as f:
+            def write_result(obj):
+                nonlocal num_written
+                # Same layout as dumping the whole list with OPT_INDENT_2
+                body = orjson.dumps(obj, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+                f.write((b",\n  " if num_written else b"\n  ") + body)
+                num_written += 1
+
+            f.write(b"[")
+            async with self:
+                tasks = [asyncio.ensure_future(process_item(idx, item)) for idx, item in enumerate(to_process)]
+                del to_process
+                completed = asyncio.as_completed(tasks)
+                num_tasks = len(tasks)
+                del tasks
+
+                # Results are written as soon as every earlier item is done, so
+                # only out-of-order completions are held in memory
+                done = {}
+                next_idx = 0
+                for fut in tqdm(completed, total=num_tasks, desc="Patching Insecure Code"):
+                    idx, result = await fut
+                    done[idx] = result
+                    while next_idx in done:
+                        write_result(done.pop(next_idx))
+                        next_idx += 1
+            f.write(b"\n]" if num_written else b"]")
 
         total_time = time.time() - start_time
         logger.info("Code patching complete!")
-        logger.info(f"Input items: {len(data)}, Patched items: {len(patched_results)}")
+        logger.info(f"Input items: {num_input}, Patched items: {num_written}")
         logger.info(f"Results saved to: {output_file}")
         logger.info(f"Total time: {total_time:.2f} seconds")
 
@@ -163,11 +238,12 @@ async def main():
     parser.add_argument("--base_url", type=str, required=True, help="Base URL for the DeepSeek API")
     parser.add_argument("--input_file", type=str, required=True, help="Path to the input JSON file")
     parser.add_argument("--output_file", type=str, required=True, help="Path to the output JSON file")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum number of concurrent API requests")
 
     args = parser.parse_args()
 
     # Initialize the patcher with command line arguments
-    patcher = DeepSeekCodePatcher(api_key=args.api_key, model_name=args.model_name, base_url=args.base_url)
+    patcher = DeepSeekCodePatcher(api_key=args.api_key, model_name=args.model_name, base_url=args.base_url, concurrency=args.concurrency)
     
     # Process the file
     await patcher.patch_code_from_file(args.input_file, args.output_file)
@@ -1,25 +1,25 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
 import os
-import re
 import sys
+import mmap
 import argparse
+import orjson
 from typing import List, Dict, Any, Optional, Tuple
 
 
-# Regular expression pattern for extracting C code blocks
-CODE_PATTERN = re.compile(
-    r'```c(.*?)```',
-    flags=re.DOTALL
-)
+# Fences delimiting the C code block
+CODE_FENCE_OPEN = "```c"
+CODE_FENCE_CLOSE = "```"
 
 def load_json_array(path: str) -> List[Dict[str, Any]]:
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(path, "rb") as f:
+        # Parse straight from the mapped file instead of copying it into a bytes object
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            data = orjson.loads(mv)
     if not isinstance(data, list):
         raise ValueError(f"File {path} is not a JSON array.")
     return data
@@ -27,14 +27,19 @@ def load_json_array(path: str) -> List[Dict[str, Any]]:
 def extract_code_strict(input_text: str) -> Optional[str]:
     if not isinstance(input_text, str):
         return None
-    m = CODE_PATTERN.search(input_text)
-    if not m:
+    start = input_text.find(CODE_FENCE_OPEN)
+    if start < 0:
         return None
-    code = m.group(1).strip() 
+    start += len(CODE_FENCE_OPEN)
+    end = input_text.find(CODE_FENCE_CLOSE, start)
+    if end < 0:
+        return None
+    code = input_text[start:end].strip()
     return code
 
 def process_model_dir(
-    first_arr: List[Dict[str, Any]],
+    first_codes: List[Optional[str]],
+    first_has_input: List[bool],
     model_dir: str,
     combined_name: str = "your_first_file",
     output_name: str = "your_out_put_file_name",
@@ -49,27 +54,25 @@ def process_model_dir(
 
     second_arr = load_json_array(second_file)
 
-    if len(second_arr) > len(first_arr):
+    if len(second_arr) > len(first_codes):
         raise ValueError(
-            f"[{model_dir}] Array length mismatch: {len(second_arr)} (second) cannot exceed {len(first_arr)} (first)"
+            f"[{model_dir}] Array length mismatch: {len(second_arr)} (second) cannot exceed {len(first_codes)} (first)"
         )
 
     merged = []
     missing = 0
 
     for idx, obj2 in enumerate(second_arr):
-        if idx >= len(first_arr):
+        if idx >= len(first_codes):
             break
         
-        obj1 = first_arr[idx]
-        
-        if "input" not in obj1:
+        if not first_has_input[idx]:
             if fail_on_missing:
                 raise ValueError(f"[{model_dir}][Index {idx}] Missing 'input' in first file object.")
             origin_code = ""
             missing += 1
         else:
-            origin_code = extract_code_strict(obj1["input"])
+            origin_code = first_codes[idx]
             if origin_code is None:
                 if fail_on_missing:
                     raise ValueError(f"[{model_dir}][Index {idx}] Code block not found in 'input'.")
@@ -81,8 +84,8 @@ def process_model_dir(
         merged.append(item)
 
     os.makedirs(model_dir, exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(merged, option=orjson.OPT_INDENT_2))
 
     return (model_dir, len(merged), missing)
 
@@ -101,6 +104,13 @@ def main() -> None:
         print(f"ERROR: Failed to load first file: {args.first_file}\n{e}", file=sys.stderr)
         sys.exit(1)
 
+    # The first file is shared by every model dir, so extract its code blocks only once
+    first_has_input = ["input" in obj1 for obj1 in first_arr]
+    first_codes = [
+        extract_code_strict(obj1["input"]) if has_input else None
+        for obj1, has_input in zip(first_arr, first_has_input)
+    ]
+
     if not os.path.isdir(args.results_root):
         print(f"ERROR: RESULTS_ROOT not found: {args.results_root}", file=sys.stderr)
         sys.exit(1)
@@ -119,7 +129,8 @@ def main() -> None:
     for model_dir in model_dirs:
         try:
             mdir, count, missing = process_model_dir(
-                first_arr=first_arr,
+                first_codes=first_codes,
+                first_has_input=first_has_input,
                 model_dir=model_dir,
                 combined_name=args.combined_name,
                 output_name=args.output_name,
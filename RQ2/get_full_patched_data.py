@@ -1,13 +1,12 @@
 import os  
-import json  
+import orjson  
 import argparse  
+from hashlib import blake2b  
+from concurrent.futures import ThreadPoolExecutor  
+from itertools import repeat  
 from pathlib import Path  
 from typing import List, Dict, Any  
 
-def wrap_c_code_block(code: str) -> str:  
-    code = "" if code is None else str(code)  
-    return f"```c\n{code}\n```"  
-
 def normalize_items(data: Any) -> List[Dict[str, Any]]:  
     if isinstance(data, list):  
         return [x for x in data if isinstance(x, dict)]  
@@ -19,20 +18,27 @@ def normalize_items(data: Any) -> List[Dict[str, Any]]:
     else:  
         return []  
 
-def extract_patched_entries(items: List[Dict[str, Any]]) -> List[Dict[str, str]]:  
+def extract_patched_entries(items: List[Dict[str, Any]], dedup: bool = False) -> List[Dict[str, str]]:  
     outputs: List[Dict[str, str]] = []  
-    for idx, rec in enumerate(items):  
+    outputs_append = outputs.append  
+    seen = set() if dedup else None  
+    for rec in items:  
         if "patched_code" not in rec:  
             continue  
         pc = rec["patched_code"]  
-        if isinstance(pc, list):  
-            for seg in pc:  
-                outputs.append({"input": wrap_c_code_block(seg)})  
-        else:  
-            outputs.append({"input": wrap_c_code_block(pc)})  
+        for seg in (pc if isinstance(pc, list) else (pc,)):  
+            code = "" if seg is None else str(seg)  
+            if seen is not None:  
+                # 16-byte digests keep the set small and make collisions negligible  
+                key = blake2b(code.encode("utf-8"), digest_size=16).digest()  
+                if key in seen:  
+                    continue  
+                seen.add(key)  
+            # Wrap each code string in a ```c fence (None becomes an empty block)  
+            outputs_append({"input": f"```c\n{code}\n```"})  
     return outputs  
 
-def process_model_dir(model_dir: Path, input_filename: str, output_filename: str) -> None:  
+def process_model_dir(model_dir: Path, input_filename: str, output_filename: str, dedup: bool = False) -> None:  
     in_path = model_dir / input_filename  
     out_path = model_dir / output_filename  
 
@@ -41,8 +47,8 @@ def process_model_dir(model_dir: Path, input_filename: str, output_filename: str
         return  
 
     try:  
-        with open(in_path, "r", encoding="utf-8") as f:  
-            data = json.load(f)  
+        with open(in_path, "rb") as f:  
+            data = orjson.loads(f.read())  
     except Exception as e:  
         print(f"[Error] Failed to read {in_path}: {e}")  
         return  
@@ -52,14 +58,14 @@ def process_model_dir(model_dir: Path, input_filename: str, output_filename: str
         print(f"[Warn] {in_path} JSON format cannot be parsed into a list of records, skipping.")  
         return  
 
-    out_recs = extract_patched_entries(items)  
+    out_recs = extract_patched_entries(items, dedup)  
     if not out_recs:  
         print(f"[Warn] No 'patched_code' field found in {in_path}, skipping.")  
         return  
 
     try:  
-        with open(out_path, "w", encoding="utf-8") as f:  
-            json.dump(out_recs, f, ensure_ascii=False, indent=2)  
+        with open(out_path, "wb") as f:  
+            f.write(orjson.dumps(out_recs, option=orjson.OPT_INDENT_2))  
         print(f"[OK] Generated {out_path} ({len(out_recs)} entries)")  
     except Exception as e:  
         print(f"[Error] Failed to write {out_path}: {e}")  
@@ -69,6 +75,7 @@ def main():
     parser.add_argument("--base_dir", type=str, required=True, help="Base directory path")
     parser.add_argument("--input_filename", type=str, required=True, help="Input JSON filename")
     parser.add_argument("--output_filename", type=str, required=True, help="Output JSON filename")
+    parser.add_argument("--dedup", action="store_true", help="Drop repeated patched_code entries (breaks index alignment with the input records)")
 
     args = parser.parse_args()
 
@@ -77,9 +84,13 @@ def main():
         print(f"[Error] Base directory does not exist: {base_dir}")  
         return  
 
-    for entry in base_dir.iterdir():  
-        if entry.is_dir():  
-            process_model_dir(entry, args.input_filename, args.output_filename)  
+    dirs = [entry for entry in base_dir.iterdir() if entry.is_dir()]  
+    if not dirs:  
+        return  
+
+    # Per-model work is dominated by file I/O, so threads are enough to overlap it  
+    with ThreadPoolExecutor(max_workers=min(32, len(dirs))) as ex:  
+        list(ex.map(process_model_dir, dirs, repeat(args.input_filename), repeat(args.output_filename), repeat(args.dedup)))  
 
 if __name__ == "__main__":  
     main()
\ No newline at end of file
@@ -3,10 +3,13 @@
 
 import os
 import re
-import json
 import ray
+import asyncio
 import logging
 import argparse
+import ijson
+from concurrent.futures import ProcessPoolExecutor
+import orjson
 from typing import List, Dict, Optional
 from packaging.version import Version
 from pathlib import Path
@@ -112,14 +115,33 @@ Output Example:
 # Answer:
 Insecure
 """ 
+# Stripped once so every prompt starts with the same bytes for vLLM prefix caching
+_SYSTEM = SYSTEM_PROMPT.strip()
+# Everything around the code block is constant, so build it once
+_PROMPT_HEAD = f"System:\n{_SYSTEM}\n\nUser:\nHere is the source code to analyze:\n```c\n"
+_PROMPT_TAIL = (
+    "\n```\n"
+    "Follow the example format strictly and do not output any additional content.\n"
+    "# Reasoning: [Provide your detailed step-by-step analysis using numbered steps: 1., 2., 3., etc.]\n"
+    "# Answer:\n['Secure' or 'Insecure']"
+    "\n\nAssistant:"
+)
+
+# ```c fence on its own line, then a looser fallback for inline fences
+_C_FENCE_RE = re.compile(r"```c\s*\n(.*?)\n```", re.DOTALL | re.IGNORECASE)
+_C_FENCE_LOOSE_RE = re.compile(r"```c(.*?)```", re.DOTALL | re.IGNORECASE)
+_SPLIT_RE = re.compile(r'[\n\r]+')
+# Line boundaries recognised by str.splitlines
+_LINE_BREAK_RE = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
 
 def read_per_model_inputs(path: Path) -> List[Dict]:
     """读取单个模型目录的 combined_full_patched_test.json（数组，每项包含 input:str）"""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} must be a list of objects")
-    data = [x for x in data if isinstance(x, dict) and isinstance(x.get("input"), str)]
+    with open(path, "rb") as f:
+        if not f.read(64).lstrip().startswith(b"["):
+            raise ValueError(f"{path} must be a list of objects")
+        f.seek(0)
+        # Stream the array so only matching rows are ever held in memory
+        data = [x for x in ijson.items(f, "item", use_float=True) if isinstance(x, dict) and isinstance(x.get("input"), str)]
     return data
 
 def print_cuda_info():
@@ -143,13 +165,13 @@ def extract_code_from_input(input_field: str) -> Optional[str]:
         return None
     text = input_field.strip()
 
-    m = re.search(r"```c\s*\n(.*?)\n```", text, re.DOTALL | re.IGNORECASE)
+    m = _C_FENCE_RE.search(text)
     if m:
         code = m.group(1).strip()
         if code:
             return code
 
-    m = re.search(r"```c(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    m = _C_FENCE_LOOSE_RE.search(text)
     if m:
         code = m.group(1).strip()
         if code:
@@ -160,16 +182,7 @@ def extract_code_from_input(input_field: str) -> Optional[str]:
     return None
 
 def build_prompt_from_code(code: str) -> str:
-    system = SYSTEM_PROMPT.strip()
-    user = (
-        "Here is the source code to analyze:\n"
-        "```c\n" + code.strip() + "\n```\n"
-        "Follow the example format strictly and do not output any additional content.\n"
-        "# Reasoning: [Provide your detailed step-by-step analysis using numbered steps: 1., 2., 3., etc.]\n"
-        "# Answer:\n['Secure' or 'Insecure']"
-    )
-
-    return f"System:\n{system}\n\nUser:\n{user}\n\nAssistant:"
+    return _PROMPT_HEAD + code.strip() + _PROMPT_TAIL
 
 def validate_and_trim_strict(text: str) -> str:
     if not text:
@@ -187,43 +200,121 @@ def validate_and_trim_strict(text: str) -> str:
         return ""
 
     head = t[:idx_ans].rstrip()
-    tail_lines = t[idx_ans:].splitlines()
 
-    ans_idx = None
-    for i, ln in enumerate(tail_lines):
-        if ln.strip() == "# Answer:":
-            ans_idx = i
+    # Walk the tail one line at a time (same breaks as str.splitlines) and stop at
+    # the word after the "# Answer:" line, instead of splitting the whole tail
+    header_lines = []
+    pos = idx_ans
+    while True:
+        m = _LINE_BREAK_RE.search(t, pos)
+        line = t[pos:m.start()] if m else t[pos:]
+        header_lines.append(line)
+        if m is None:
+            return ""
+        pos = m.end()
+        if line.strip() == "# Answer:":
             break
-    if ans_idx is None or ans_idx == len(tail_lines) - 1:
-        return ""
 
-    final_word = tail_lines[ans_idx + 1].strip()
+    m = _LINE_BREAK_RE.search(t, pos)
+    final_word = (t[pos:m.start()] if m else t[pos:]).strip()
     if final_word not in ("Secure", "Insecure"):
         return ""
 
-    answer_header = "\n".join(tail_lines[:ans_idx + 1])
+    answer_header = "\n".join(header_lines)
     trimmed = head + "\n" + answer_header + "\n" + final_word
     return trimmed
 
 def coerce_to_template(raw_text: str) -> str:
-    lines = [ln.strip() for ln in re.split(r'[\n\r]+', (raw_text or "")) if ln.strip()]
+    lines = [ln.strip() for ln in _SPLIT_RE.split(raw_text or "") if ln.strip()]
     if not lines:
         lines = ["No explicit reasoning found."]
     bullets = lines[:5]
     reasoning = "\n".join(f"{i+1}. {b}" for i, b in enumerate(bullets))
     return f"# Reasoning:\n{reasoning}\n\n# Answer:\nInsecure"
 
-def run_with_vllm_direct(data: List[Dict], model_source: str) -> List[Dict]:
-    from vllm import LLM, SamplingParams
+def postprocess_output(text: str) -> Dict:
+    trimmed = validate_and_trim_strict(text)
+    if not trimmed:
+        trimmed = coerce_to_template(text)
+    return {"answer": trimmed}
+
+TOKENIZE_CHUNK_SIZE = 64
+MAX_MODEL_LEN = 3072
+# Written for prompts longer than MAX_MODEL_LEN, which the engine would reject; it carries
+# no "# Answer:" verdict, so coverage scripts never count it as Secure or Insecure
+PROMPT_TOO_LONG_ANSWER = "# Skipped:\nPrompt longer than the model context; not evaluated."
+_worker_tokenizer = None
+
+def _init_tokenizer_worker(model_source: str):
+    global _worker_tokenizer
+    from transformers import AutoTokenizer
+    _worker_tokenizer = AutoTokenizer.from_pretrained(model_source, use_fast=True, trust_remote_code=True)
+
+def _tokenize_chunk(prompts: List[str]) -> List[List[int]]:
+    return _worker_tokenizer(prompts).input_ids
+
+def start_tokenization(prompts: List[str], model_source: str):
+    """
+    Tokenize prompts in a process pool; returns (executor, futures) so the caller can
+    load the engine while the workers run.
+    """
+    ex = ProcessPoolExecutor(
+        max_workers=min(8, os.cpu_count() or 1),
+        initializer=_init_tokenizer_worker,
+        initargs=(model_source,),
+    )
+    futures = [
+        ex.submit(_tokenize_chunk, prompts[i:i + TOKENIZE_CHUNK_SIZE])
+        for i in range(0, len(prompts), TOKENIZE_CHUNK_SIZE)
+    ]
+    return ex, futures
+
+async def run_async(prompts: List, lengths: List[int], engine, sp) -> List[Dict]:
+    """
+    Submit every prompt to the async engine and post-process each result as soon as
+    it finishes, so validation overlaps with the generations still running on GPU.
+    """
+    results_list: List[Optional[Dict]] = [None] * len(prompts)
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def _submit(i: int, prompt):
+        last = None
+        async for out in engine.generate(prompt, sp, request_id=str(i)):
+            last = out
+        text = last.outputs[0].text if (last is not None and last.outputs) else ""
+        await done.put((i, text))
+
+    async def _consume():
+        for _ in range(len(prompts)):
+            i, text = await done.get()
+            results_list[i] = postprocess_output(text)
+
+    # Submit prompts shortest-first so scheduled batches hold similar lengths;
+    # results are stored by index, which keeps the positional output order
+    order = sorted(range(len(prompts)), key=lengths.__getitem__)
+    consumer = asyncio.create_task(_consume())
+    await asyncio.gather(*[_submit(i, prompts[i]) for i in order])
+    await consumer
+    return results_list
 
-    llm = LLM(
+def run_with_vllm_direct(data: List[Dict], model_source: str, tensor_parallel_size: int = 4,
+                         distributed_executor_backend: Optional[str] = None) -> List[Dict]:
+    from vllm import AsyncEngineArgs, AsyncLLMEngine, SamplingParams
+    from vllm.inputs import TokensPrompt
+
+    engine_args = AsyncEngineArgs(
         model=model_source,
-        tensor_parallel_size=4,
-        dtype="float16",
-        enforce_eager=True,
-        gpu_memory_utilization=0.80,
-        max_model_len=3072,
+        tensor_parallel_size=tensor_parallel_size,
+        distributed_executor_backend=distributed_executor_backend,
+        dtype="bfloat16",
+        # FP8 KV cache halves per-token cache bytes, leaving room for a larger batch
+        kv_cache_dtype="fp8",
+        gpu_memory_utilization=0.92,
+        max_model_len=MAX_MODEL_LEN,
         enable_chunked_prefill=True,
+        enable_prefix_caching=True,
+        max_num_seqs=512,
+        max_num_batched_tokens=8192,
         trust_remote_code=True,
     )
     sp = SamplingParams(
@@ -239,17 +330,53 @@ def run_with_vllm_direct(data: List[Dict], model_source: str) -> List[Dict]:
             code = "int main(void){return 0;}"
         prompts.append(build_prompt_from_code(code))
 
-    outputs = llm.generate(prompts, sp)
+    # Tokenization runs in worker processes while the engine loads; the engine then
+    # receives token ids and skips its own serial tokenization
+    tok_ex, tok_futures = start_tokenization(prompts, model_source)
+
+    async def _run():
+        engine = AsyncLLMEngine.from_engine_args(engine_args)
+        try:
+            token_ids = [ids for fut in tok_futures for ids in fut.result()]
+            # The engine rejects prompts longer than max_model_len (one would fail the whole run),
+            # so those rows get a non-verdict placeholder instead of being submitted
+            valid = [i for i, ids in enumerate(token_ids) if len(ids) <= MAX_MODEL_LEN]
+            results = [{"answer": PROMPT_TOO_LONG_ANSWER} for _ in token_ids]
+            if len(valid) < len(token_ids):
+                skipped = sorted(set(range(len(token_ids))).difference(valid))
+                logger.warning(f"{len(skipped)} prompts have > {MAX_MODEL_LEN} tokens; not submitted "
+                               f"(rows {skipped[:20]}{' ...' if len(skipped) > 20 else ''})")
+            token_prompts = [TokensPrompt(prompt_token_ids=token_ids[i]) for i in valid]
+            outputs = await run_async(token_prompts, [len(token_ids[i]) for i in valid], engine, sp)
+            for i, out in zip(valid, outputs):
+                results[i] = out
+            return results
+        finally:
+            # V1 AsyncLLM has shutdown(); the V0 AsyncLLMEngine that vLLM falls back to
+            # (e.g. for an FP8 KV cache it cannot serve on V1) only has shutdown_background_loop()
+            shutdown = getattr(engine, "shutdown", None) or getattr(engine, "shutdown_background_loop", None)
+            if shutdown is not None:
+                shutdown()
 
-    results_list: List[Dict] = []
-    for out in outputs:
-        text = out.outputs[0].text if (out.outputs and len(out.outputs) > 0) else ""
-        trimmed = validate_and_trim_strict(text)
-        if not trimmed:
-            trimmed = coerce_to_template(text)
-        results_list.append({"answer": trimmed})
+    try:
+        return asyncio.run(_run())
+    finally:
+        tok_ex.shutdown(cancel_futures=True)
 
-    return results_list
+@ray.remote
+def run_one_model(model_key: str, model_source: str, in_path: str, out_path: str, tp_size: int) -> int:
+    data = read_per_model_inputs(Path(in_path))
+    logger.info(f"[{model_key}] Loaded {len(data)} rows from {Path(in_path).name}")
+
+    # Inside a Ray task vLLM spawns its own tensor-parallel workers on the GPUs Ray assigned
+    results_list = run_with_vllm_direct(data, model_source, tensor_parallel_size=tp_size,
+                                        distributed_executor_backend="mp")
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "wb") as f:
+        f.write(orjson.dumps(results_list, option=orjson.OPT_INDENT_2))
+    logger.info(f"[{model_key}] Wrote JSON to {out_path} (records={len(results_list)})")
+    return len(results_list)
 
 def main():
     # Argument parsing for external parameters
@@ -257,6 +384,7 @@ def main():
     parser.add_argument("--base_results_dir", type=str, required=True, help="Base directory for results")
     parser.add_argument("--input_basename", type=str, required=True, help="Input file name for each model")
     parser.add_argument("--output_basename", type=str, required=True, help="Output file name for each model")
+    parser.add_argument("--tensor_parallel_size", type=int, default=4, help="GPUs per model (tensor parallel size)")
     args = parser.parse_args()
 
     # Assign global variables from command-line arguments
@@ -267,6 +395,7 @@ def main():
 
     print_cuda_info()
 
+    jobs = []
     for model_key, model_source in MODELS.items():
         logger.info("=" * 80)
         logger.info(f"Model [{model_key}] => {model_source}")
@@ -283,17 +412,37 @@ def main():
             logger.warning(f"[{model_key}] Input file not found: {in_path}. Skipping this model.")
             continue
 
-        try:
-            data = read_per_model_inputs(in_path)
-            logger.info(f"[{model_key}] Loaded {len(data)} rows from {in_path.name}")
-
-            results_list = run_with_vllm_direct(data, model_source)
-
-            os.makedirs(model_dir, exist_ok=True)
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(results_list, f, ensure_ascii=False, indent=2)
-            logger.info(f"[{model_key}] Wrote JSON to {out_path} (records={len(results_list)})")
+        jobs.append((model_key, model_source, in_path, out_path))
+
+    if not jobs:
+        logger.info("No models to run. Done.")
+        return
+
+    ray.init(ignore_reinit_error=True)
+    total_gpus = int(ray.cluster_resources().get("GPU", 0))
+    if total_gpus == 0:
+        logger.error("No GPUs visible to Ray; cannot run vLLM.")
+        return
+
+    tp_size = args.tensor_parallel_size
+    if tp_size > total_gpus:
+        logger.error(f"tensor_parallel_size={tp_size} needs more GPUs than Ray sees ({total_gpus}).")
+        return
+
+    # Each model reserves tp_size GPUs; models that do not fit yet wait in Ray's queue
+    # until a running one frees its group. Ray assigns CUDA_VISIBLE_DEVICES per task
+    logger.info(f"Running {len(jobs)} model(s) on {total_gpus} GPU(s), tensor_parallel_size={tp_size} each, "
+                f"up to {min(len(jobs), total_gpus // tp_size)} at a time")
+    futures = {
+        model_key: run_one_model.options(num_gpus=tp_size).remote(
+            model_key, model_source, str(in_path), str(out_path), tp_size
+        )
+        for model_key, model_source, in_path, out_path in jobs
+    }
 
+    for model_key, fut in futures.items():
+        try:
+            ray.get(fut)
         except Exception:
             logger.error(f"[{model_key}] Inference failed.", exc_info=True)
             continue
@@ -3,13 +3,16 @@
 
 import os
 import re
-import json
 import logging
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import List, Dict, Any, Optional, Tuple
 from tqdm import tqdm
 import asyncio
-import aiohttp
+import httpx
 import argparse
+import ijson
+import orjson
 
 logger = logging.getLogger("deepseek_variant_parallel_newio")
 if not logger.handlers:
@@ -18,6 +21,12 @@ if not logger.handlers:
         format="%(asctime)s [%(levelname)s] %(message)s"
     )
 
+_C_BLOCK_RE = re.compile(r"```c\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+# Numbered reasoning points ("1. ...") written before the "# Answer:" header
+_REASONING_BULLET_RE = re.compile(r"^\s*\d+\.\s+(.+?)$", re.MULTILINE)
+# Outermost [...] span, so fences or chatter around the JSON array are ignored
+_JSON_ARR_RE = re.compile(r"\[.*\]", re.DOTALL)
+
 class Prompts:
     VULN_ANALYSIS_PROMPT = """You are a senior C security expert. Your task is to extract concrete vulnerabilities that are explicitly present or clearly implied by the provided SECURITY ANALYSIS.
 
@@ -52,13 +61,48 @@ OUTPUT FORMAT:
 Generate ONE variant that retains ONLY the specified vulnerability and fixes all others supported by the SECURITY ANALYSIS. Ensure the retained vulnerability remains unfixed and observable. Do not introduce any fixes beyond the analysis scope."""
 
 class LLMCaller:
-    def __init__(self, api_key: str, model: str, base_url: str):
+    def __init__(self, api_key: str, model: str, base_url: str, concurrency: int = 64,
+                 cache_size: int = 4096, cache_dir: Optional[str] = None):
         self.base_url = base_url
         self.endpoint = f"{self.base_url}chat/completions"
+        # Plain-text completions route; accepts a list of prompts on vLLM-style servers
+        self.batch_endpoint = f"{self.base_url}completions"
         self.api_key = api_key
         self.model = model
-
-    async def _async_create_completion(self, prompt: str) -> str:
+        self.concurrency = concurrency
+        self.timeout = httpx.Timeout(60.0)
+        # Pooled HTTP/2 client shared by all requests while inside `async with llm`
+        self._session: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+        # Responses keyed by prompt digest: an in-memory LRU, plus an optional on-disk
+        # cache that survives reruns. Identical prompts already in flight share one request.
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._disk_cache = None
+        if cache_dir:
+            import diskcache
+            self._disk_cache = diskcache.Cache(cache_dir)
+
+    async def __aenter__(self):
+        # HTTP/2 multiplexes concurrent requests over few connections (falls back to 1.1 if unsupported)
+        self._session = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+            timeout=self.timeout,
+            headers={"Accept-Encoding": "gzip"},
+        )
+        # Bounds requests actually sent; cache hits never wait for a slot
+        self._sem = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.aclose()
+        self._session = None
+        self._sem = None
+
+    async def _post_completion(self, session: httpx.AsyncClient, prompt: str) -> str:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -70,197 +114,14 @@ class LLMCaller:
             "messages": [{"role": "user", "content": prompt}],
             "stream": False
         }
-        timeout = aiohttp.ClientTimeout(total=60)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(self.endpoint, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"].strip()
-                else:
-                    text = await response.text()
-                    raise RuntimeError(f"LLM request failed, status={response.status}, body={text[:500]}")
-
-    def create_completion(self, prompt: str) -> str:
-        try:
-            return asyncio.run(self._async_create_completion(prompt))
-        except RuntimeError:
-            import threading
-            out = {"text": ""}
-            err = {"e": None}
-            def _worker():
-                try:
-                    out["text"] = asyncio.run(self._async_create_completion(prompt))
-                except Exception as e:
-                    err["e"] = e
-            t = threading.Thread(target=_worker, daemon=True)
-            t.start()
-            t.join()
-            if err["e"]:
-                raise err["e"]
-            return out["text"]
-
-class DeepseekVariantPatcher:
-    def __init__(self, model: str = "your_model", temperature: float = 0.0):
-        self.llm = LLMCaller(model=model)
-        self.model = model
-        self.temperature = temperature
-
-    def analyze_vulnerabilities(self, analysis_text: str) -> List[str]:
-        prompt = Prompts.VULN_ANALYSIS_PROMPT.format(analysis=analysis_text)
-        raw = self.llm.create_completion(prompt)
-        return json.loads(raw) if raw else []
-
-    def generate_variant(self, code: str, analysis_text: str, retained_vuln: str) -> Optional[str]:
-        prompt = Prompts.PATCH_PROMPT_TEMPLATE.format(code=code, analysis=analysis_text, retained_vuln=retained_vuln)
-        raw = self.llm.create_completion(prompt)
-        return self.extract_code_block_from_model(raw)
-
-    @staticmethod
-    def extract_code_block_from_model(text: str) -> Optional[str]:
-        if not text:
-            return None
-        m = re.search(r"```c\s*(.*?)\s*```", text, re.DOTALL | re.IGNORECASE)
-        if m:
-            return m.group(1).strip()
-        return None
-
-    def process_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        insecure_marker = "# Answer:\nInsecure"
-        results: List[Dict[str, Any]] = []
-        pbar = tqdm(total=len(entries), desc="Processing entries", dynamic_ncols=True)
-
-        for idx, item in enumerate(entries):
-            try:
-                answer_text = item.get("answer", "")
-                if not isinstance(answer_text, str) or insecure_marker not in answer_text:
-                    pbar.update(1)
-                    continue
-
-                origin_code = item.get("origin_code", "")
-                if not isinstance(origin_code, str) or not origin_code.strip():
-                    logger.warning(f"[Index {idx}] Skip: missing/empty origin_code.")
-                    pbar.update(1)
-                    continue
-
-                vulns = self.analyze_vulnerabilities(answer_text)
-                if not vulns:
-                    logger.info(f"[Index {idx}] No vulnerabilities parsed; skipping.")
-                    pbar.update(1)
-                    continue
-
-                for v_desc in vulns:
-                    variant_code = self.generate_variant(origin_code, answer_text, v_desc)
-                    if variant_code:
-                        result = dict(item)
-                        result["index"] = idx 
-                        result["patched_code"] = variant_code
-                        results.append(result)
-
-                pbar.update(1)  
-
-            except Exception as e:
-                logger.error(f"[Index {idx}] Error processing entry: {e}", exc_info=True)
-                pbar.update(1) 
-                continue
-
-        pbar.close()  
-        return results
-
-def main():
-    # Argument parsing for external parameters
-    parser = argparse.ArgumentParser(description="Deepseek Variant Patcher")
-    parser.add_argument("--base_url", type=str, required=True, help="Base URL for the API")
-    parser.add_argument("--api_key", type=str, required=True, help="API key for authorization")
-    parser.add_argument("--model", type=str, required=True, help="Model to use")
-    parser.add_argument("--input_file", type=str, required=True, help="Input JSON file name")
-    parser.add_argument("--output_file", type=str, required=True, help="Output JSON file name")
-
-    args = parser.parse_args()
-
-    input_file = args.input_file
-    output_file = args.output_file
-
-    try:
-        with open(input_file, "r", encoding="utf-8") as f:
-            entries = json.load(f)
-            if not isinstance(entries, list):
-                raise ValueError("Input JSON must be a JSON array.")
-    except Exception as e:
-        logger.error(f"Failed to load input file: {e}")
-        return
-
-    patcher = DeepseekVariantPatcher(model=args.model)
-
-    results = patcher.process_entries(entries)
-
-    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-        
-    logger.info(f"Results saved to: {output_file}")
-
-if __name__ == "__main__":
-    main()#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-
-import os
-import re
-import json
-import logging
-from typing import List, Dict, Any, Optional
-from tqdm import tqdm
-import asyncio
-import aiohttp
-import argparse
-
-logger = logging.getLogger("deepseek_variant_parallel_newio")
-if not logger.handlers:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s"
-    )
-
-class Prompts:
-    VULN_ANALYSIS_PROMPT = """You are a senior C security expert. Your task is to extract concrete vulnerabilities that are explicitly present or clearly implied by the provided SECURITY ANALYSIS.
-
-[SECURITY ANALYSIS]
-{analysis}
-
-STRICT OUTPUT CONTRACT:
-- Output MUST be a single, valid JSON array of strings (UTF-8, no trailing comma).
-- Do NOT include any extra text, labels, commentary, markdown, or code fences.
-- If no concrete vulnerabilities can be extracted from the analysis, output [].
-"""
-
-    PATCH_PROMPT_TEMPLATE = """You are an expert C programmer and security specialist. Generate ONE patched, secure variant of the provided source code strictly based on the SECURITY ANALYSIS.
-
-STRICT WORKFLOW (DO NOT OUTPUT THIS LIST):
-1) Read SECURITY ANALYSIS and privately enumerate the concrete vulnerabilities that it explicitly states or clearly implies.
-2) For THIS single variant, you MUST RETAIN EXACTLY the following vulnerability and FIX all other vulnerabilities supported by the SECURITY ANALYSIS:
-   - VULNERABILITY TO RETAIN: {retained_vuln}
-3) If any change would also fix the retained vulnerability, do NOT apply that change; instead, choose an alternative repair that still remediates the other issues while keeping the retained vulnerability observable.
-4) Do NOT introduce or fix any issue that is not present or implied in the SECURITY ANALYSIS.
-
-OUTPUT FORMAT:
-- Output ONLY one complete C function wrapped in a single ```c ... ``` block. No extra text before or after.
-
-[VULNERABLE CODE]
-{code}
-
-[SECURITY ANALYSIS]
-{analysis}
-
-[INSTRUCTION]
-Generate ONE variant that retains ONLY the specified vulnerability and fixes all others supported by the SECURITY ANALYSIS. Ensure the retained vulnerability remains unfixed and observable. Do not introduce any fixes beyond the analysis scope."""
-
-class LLMCaller:
-    def __init__(self, api_key: str, model: str, base_url: str):
-        self.base_url = base_url
-        self.endpoint = f"{self.base_url}chat/completions"
-        self.api_key = api_key
-        self.model = model
-
-    async def _async_create_completion(self, prompt: str) -> str:
+        response = await session.post(self.endpoint, headers=headers, json=payload)
+        if response.status_code == 200:
+            result = response.json()
+            return result["choices"][0]["message"]["content"].strip()
+        else:
+            raise RuntimeError(f"LLM request failed, status={response.status_code}, body={response.text[:500]}")
+
+    async def _post_completions_batch(self, session: httpx.AsyncClient, prompts: List[str]) -> List[str]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -269,104 +130,299 @@ class LLMCaller:
             "model": self.model,
             "max_tokens": 2048,
             "temperature": 0.0,
-            "messages": [{"role": "user", "content": prompt}],
+            "prompt": prompts,
             "stream": False
         }
-        timeout = aiohttp.ClientTimeout(total=60)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(self.endpoint, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"].strip()
-                else:
-                    text = await response.text()
-                    raise RuntimeError(f"LLM request failed, status={response.status}, body={text[:500]}")
+        response = await session.post(self.batch_endpoint, headers=headers, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"LLM batch request failed, status={response.status_code}, body={response.text[:500]}")
+        choices = response.json()["choices"]
+        if len(choices) != len(prompts):
+            raise RuntimeError(f"LLM batch request returned {len(choices)} choices for {len(prompts)} prompts")
+        # Choices may come back in any order; "index" maps them to their prompt
+        texts = [""] * len(prompts)
+        for choice in choices:
+            texts[choice["index"]] = choice["text"].strip()
+        return texts
+
+    def _cache_key(self, prompt: str) -> str:
+        return blake2b(f"{self.model}\0{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+        if self._disk_cache is not None:
+            text = self._disk_cache.get(key)
+            if text is not None:
+                self._cache_put(key, text, persist=False)
+        return text
+
+    def _cache_put(self, key: str, text: str, persist: bool = True):
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        if persist and self._disk_cache is not None:
+            self._disk_cache.set(key, text)
+
+    async def _request(self, prompt: str) -> str:
+        if self._session is None:
+            return await self._async_create_completion(prompt)
+        async with self._sem:
+            return await self._post_completion(self._session, prompt)
+
+    async def acreate_completion(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            text = await self._request(prompt)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # Mark retrieved; waiters (if any) still receive it
+            raise
+        else:
+            fut.set_result(text)
+            self._cache_put(key, text)
+            return text
+        finally:
+            del self._inflight[key]
+
+    async def acreate_completions_batch(self, prompts: List[str]) -> List[str]:
+        """Complete several prompts with one request to the completions route.
+
+        Results keep the order of prompts. Cached prompts are not sent again.
+        """
+        # Completions skip the chat template, so they are cached apart from chat responses
+        keys = [self._cache_key("completions\0" + p) for p in prompts]
+        texts: List[Optional[str]] = [self._cache_get(k) for k in keys]
+        missing = [i for i, t in enumerate(texts) if t is None]
+        if missing:
+            batch = [prompts[i] for i in missing]
+            if self._session is None:
+                async with httpx.AsyncClient(http2=True, timeout=self.timeout) as session:
+                    fresh = await self._post_completions_batch(session, batch)
+            else:
+                async with self._sem:
+                    fresh = await self._post_completions_batch(self._session, batch)
+            for i, text in zip(missing, fresh):
+                texts[i] = text
+                self._cache_put(keys[i], text)
+        return texts
+
+    async def _async_create_completion(self, prompt: str) -> str:
+        # One-off session for callers outside the pooled pipeline
+        async with httpx.AsyncClient(http2=True, timeout=self.timeout) as session:
+            return await self._post_completion(session, prompt)
 
     def create_completion(self, prompt: str) -> str:
+        """Blocking wrapper for callers without an event loop."""
         try:
-            return asyncio.run(self._async_create_completion(prompt))
+            asyncio.get_running_loop()
         except RuntimeError:
-            import threading
-            out = {"text": ""}
-            err = {"e": None}
-            def _worker():
-                try:
-                    out["text"] = asyncio.run(self._async_create_completion(prompt))
-                except Exception as e:
-                    err["e"] = e
-            t = threading.Thread(target=_worker, daemon=True)
-            t.start()
-            t.join()
-            if err["e"]:
-                raise err["e"]
-            return out["text"]
+            return asyncio.run(self.acreate_completion(prompt))
+        raise RuntimeError("create_completion() cannot run inside an event loop; await acreate_completion() instead")
 
 class DeepseekVariantPatcher:
-    def __init__(self, model: str = "your_model", temperature: float = 0.0):
-        self.llm = LLMCaller(model=model)
+    def __init__(self, api_key: str, model: str = "your_model", base_url: str = "your_base_url",
+                 temperature: float = 0.0, concurrency: int = 64, cache_dir: Optional[str] = None,
+                 parse_bullets: bool = False, compact_records: bool = False,
+                 batch_completions: bool = False):
+        self.llm = LLMCaller(api_key=api_key, model=model, base_url=base_url,
+                             concurrency=concurrency, cache_dir=cache_dir)
         self.model = model
         self.temperature = temperature
-
-    def analyze_vulnerabilities(self, analysis_text: str) -> List[str]:
+        self.concurrency = concurrency
+        # Opt-in: use the numbered reasoning points as the vulnerabilities instead of asking the LLM;
+        # they are analysis steps, not curated vulnerabilities, so this changes the dataset
+        self.parse_bullets = parse_bullets
+        # Opt-in: write only index, origin_code, answer, retained_vuln and patched_code per variant
+        # instead of copying every input field
+        self.compact_records = compact_records
+        # Request all variants of an entry in one completions call instead of one chat call each
+        self.batch_completions = batch_completions
+        self._jsonl = None  # Optional binary handle receiving each result as it is produced
+
+    async def analyze_vulnerabilities(self, analysis_text: str) -> List[str]:
         prompt = Prompts.VULN_ANALYSIS_PROMPT.format(analysis=analysis_text)
-        raw = self.llm.create_completion(prompt)
-        return json.loads(raw) if raw else []
+        raw = await self.llm.acreate_completion(prompt)
+        m = _JSON_ARR_RE.search(raw) if raw else None
+        if not m:
+            return []
+        try:
+            vulns = orjson.loads(m.group(0))
+        except orjson.JSONDecodeError:
+            logger.warning(f"Unparsable vulnerability list from LLM: {raw[:200]!r}")
+            return []
+        return vulns if isinstance(vulns, list) else []
 
-    def generate_variant(self, code: str, analysis_text: str, retained_vuln: str) -> Optional[str]:
+    async def generate_variant(self, code: str, analysis_text: str, retained_vuln: str) -> Optional[str]:
         prompt = Prompts.PATCH_PROMPT_TEMPLATE.format(code=code, analysis=analysis_text, retained_vuln=retained_vuln)
-        raw = self.llm.create_completion(prompt)
+        raw = await self.llm.acreate_completion(prompt)
         return self.extract_code_block_from_model(raw)
 
+    async def generate_variants_batch(self, code: str, analysis_text: str, retained_vulns: List[str]) -> List[Optional[str]]:
+        prompts = [
+            Prompts.PATCH_PROMPT_TEMPLATE.format(code=code, analysis=analysis_text, retained_vuln=v)
+            for v in retained_vulns
+        ]
+        raws = await self.llm.acreate_completions_batch(prompts)
+        return [self.extract_code_block_from_model(raw) for raw in raws]
+
+    @staticmethod
+    def parse_reasoning_bullets(analysis_text: str) -> List[str]:
+        head = analysis_text.split("# Answer:", 1)[0]
+        return [b.strip() for b in _REASONING_BULLET_RE.findall(head) if b.strip()]
+
     @staticmethod
     def extract_code_block_from_model(text: str) -> Optional[str]:
         if not text:
             return None
-        m = re.search(r"```c\s*(.*?)\s*```", text, re.DOTALL | re.IGNORECASE)
+        m = _C_BLOCK_RE.search(text)
         if m:
             return m.group(1).strip()
         return None
 
-    def process_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def _entry_vulns(self, idx: int, item: Dict[str, Any]) -> List[str]:
+        """Validate an entry and list the vulnerabilities to generate variants for."""
         insecure_marker = "# Answer:\nInsecure"
-        results: List[Dict[str, Any]] = []
-        pbar = tqdm(total=len(entries), desc="Processing entries", dynamic_ncols=True)
-
-        for idx, item in enumerate(entries):
-            try:
-                answer_text = item.get("answer", "")
-                if not isinstance(answer_text, str) or insecure_marker not in answer_text:
-                    pbar.update(1)
-                    continue
-
-                origin_code = item.get("origin_code", "")
-                if not isinstance(origin_code, str) or not origin_code.strip():
-                    logger.warning(f"[Index {idx}] Skip: missing/empty origin_code.")
-                    pbar.update(1)
-                    continue
-
-                vulns = self.analyze_vulnerabilities(answer_text)
+        answer_text = item.get("answer", "")
+        if not isinstance(answer_text, str) or insecure_marker not in answer_text:
+            return []
+
+        origin_code = item.get("origin_code", "")
+        if not isinstance(origin_code, str) or not origin_code.strip():
+            logger.warning(f"[Index {idx}] Skip: missing/empty origin_code.")
+            return []
+
+        vulns = self.parse_reasoning_bullets(answer_text) if self.parse_bullets else []
+        if not vulns:
+            vulns = await self.analyze_vulnerabilities(answer_text)
+        if not vulns:
+            logger.info(f"[Index {idx}] No vulnerabilities parsed; skipping.")
+        return vulns
+
+    def _make_result(self, idx: int, item: Dict[str, Any], retained_vuln: str, variant_code: str) -> Dict[str, Any]:
+        if self.compact_records:
+            result = {
+                "index": idx,
+                "origin_code": item.get("origin_code"),
+                "answer": item.get("answer"),
+                "retained_vuln": retained_vuln,
+                "patched_code": variant_code,
+            }
+        else:
+            result = dict(item)
+            result["index"] = idx 
+            result["patched_code"] = variant_code
+        if self._jsonl is not None:
+            self._jsonl.write(orjson.dumps(result) + b"\n")
+            self._jsonl.flush()
+        return result
+
+    async def aprocess_indexed_entries(self, indexed_entries: List[Tuple[int, Dict[str, Any]]],
+                                       jsonl_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Process (original index, entry) pairs; the index is kept in each result.
+
+        Entries flow through two stages joined by a bounded queue: analyzers list the
+        vulnerabilities of each entry and generators request one variant per
+        vulnerability, so patch generation starts while later entries are still
+        being analyzed.
+
+        If jsonl_path is given, every result is also appended there as soon as it is
+        produced (completion order), so a crashed run keeps its finished work.
+        """
+        # Throttled refreshes; no terminal-size query per redraw
+        pbar = tqdm(total=len(indexed_entries), desc="Processing entries", mininterval=0.5,
+                    miniters=max(1, len(indexed_entries) // 200), smoothing=0.1)
+
+        # slots[pos][k] holds the variant for the k-th vulnerability of entry pos
+        slots: List[List[Optional[Dict[str, Any]]]] = [[] for _ in indexed_entries]
+        remaining = [0] * len(indexed_entries)
+        num_analyzers = max(1, self.concurrency // 2)
+        num_generators = max(1, self.concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2 * num_generators)
+        # Shared by all analyzers, so entries are picked up in input order
+        pending = iter(enumerate(indexed_entries))
+
+        async def analyzer():
+            for pos, (idx, item) in pending:
+                try:
+                    vulns = await self._entry_vulns(idx, item)
+                except Exception as e:
+                    logger.error(f"[Index {idx}] Error processing entry: {e}", exc_info=True)
+                    vulns = []
                 if not vulns:
-                    logger.info(f"[Index {idx}] No vulnerabilities parsed; skipping.")
                     pbar.update(1)
                     continue
-
-                for v_desc in vulns:
-                    variant_code = self.generate_variant(origin_code, answer_text, v_desc)
+                slots[pos] = [None] * len(vulns)
+                if self.batch_completions:
+                    remaining[pos] = 1
+                    await queue.put((pos, 0, vulns))
+                    continue
+                remaining[pos] = len(vulns)
+                for k, v_desc in enumerate(vulns):
+                    await queue.put((pos, k, [v_desc]))
+
+        async def generator():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                # Each job covers the vulnerabilities at slots[pos][start:start + len(descs)]
+                pos, start, descs = job
+                idx, item = indexed_entries[pos]
+                try:
+                    if self.batch_completions:
+                        codes = await self.generate_variants_batch(item["origin_code"], item["answer"], descs)
+                    else:
+                        codes = [await self.generate_variant(item["origin_code"], item["answer"], descs[0])]
+                except Exception as e:
+                    logger.error(f"[Index {idx}] Error generating variant: {e}")
+                    codes = []
+                for k, (v_desc, variant_code) in enumerate(zip(descs, codes), start):
                     if variant_code:
-                        result = dict(item)
-                        result["index"] = idx 
-                        result["patched_code"] = variant_code
-                        results.append(result)
+                        slots[pos][k] = self._make_result(idx, item, v_desc, variant_code)
+                remaining[pos] -= 1
+                if remaining[pos] == 0:
+                    pbar.update(1)
 
-                pbar.update(1)  
+        async def run_analyzers():
+            await asyncio.gather(*[analyzer() for _ in range(num_analyzers)])
+            # One sentinel per generator closes the queue
+            for _ in range(num_generators):
+                await queue.put(None)
 
-            except Exception as e:
-                logger.error(f"[Index {idx}] Error processing entry: {e}", exc_info=True)
-                pbar.update(1) 
-                continue
+        self._jsonl = open(jsonl_path, "wb") if jsonl_path else None
+        try:
+            async with self.llm:
+                await asyncio.gather(run_analyzers(), *[generator() for _ in range(num_generators)])
+        finally:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
 
         pbar.close()  
-        return results
+        # Flatten in entry order so the output matches the sequential version
+        return [result for entry_slots in slots for result in entry_slots if result is not None]
+
+    async def aprocess_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self.aprocess_indexed_entries(list(enumerate(entries)))
+
+    def process_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return asyncio.run(self.aprocess_entries(entries))
 
 def main():
     # Argument parsing for external parameters
@@ -376,30 +432,49 @@ def main():
     parser.add_argument("--model", type=str, required=True, help="Model to use")
     parser.add_argument("--input_file", type=str, required=True, help="Input JSON file name")
     parser.add_argument("--output_file", type=str, required=True, help="Output JSON file name")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum number of concurrent API requests")
+    parser.add_argument("--parse_bullets", action="store_true", help="Use the numbered reasoning points as the vulnerabilities to retain, asking the LLM only when none are found (changes the dataset)")
+    parser.add_argument("--compact_records", action="store_true", help="Write only index, origin_code, answer, retained_vuln and patched_code per output record (default: every input field plus index and patched_code)")
+    parser.add_argument("--batch_completions", action="store_true", help="Send all variants of an entry as one prompt list to the /completions route (vLLM-style servers; no chat template)")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory for an on-disk response cache reused across runs (optional)")
 
     args = parser.parse_args()
 
     input_file = args.input_file
     output_file = args.output_file
 
+    insecure_marker = "# Answer:\nInsecure"
     try:
-        with open(input_file, "r", encoding="utf-8") as f:
-            entries = json.load(f)
-            if not isinstance(entries, list):
+        with open(input_file, "rb") as f:
+            if not f.read(64).lstrip().startswith(b"["):
                 raise ValueError("Input JSON must be a JSON array.")
+            f.seek(0)
+            # Stream the array and keep only insecure entries, with their original index
+            entries = [
+                (idx, obj)
+                for idx, obj in enumerate(ijson.items(f, "item", use_float=True))
+                if isinstance(obj, dict)
+                and isinstance(obj.get("answer"), str)
+                and insecure_marker in obj["answer"]
+            ]
     except Exception as e:
         logger.error(f"Failed to load input file: {e}")
         return
 
-    patcher = DeepseekVariantPatcher(model=args.model)
-
-    results = patcher.process_entries(entries)
+    patcher = DeepseekVariantPatcher(api_key=args.api_key, model=args.model, base_url=args.base_url,
+                                     concurrency=args.concurrency, cache_dir=args.cache_dir,
+                                     parse_bullets=args.parse_bullets,
+                                     compact_records=args.compact_records,
+                                     batch_completions=args.batch_completions)
 
     os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    jsonl_file = output_file + ".jsonl"
+    results = asyncio.run(patcher.aprocess_indexed_entries(entries, jsonl_path=jsonl_file))
+
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
         
-    logger.info(f"Results saved to: {output_file}")
+    logger.info(f"Results saved to: {output_file} (incremental copy: {jsonl_file})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
+import os
+import ijson
 import logging
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Dict, List, Set, Any
+from typing import Dict, Iterator, List, Optional, Any
 import argparse
 
+import numpy as np
+
 # ===== Logging =====
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 logger = logging.getLogger("secure-coverage")
@@ -16,59 +22,87 @@ BASE_DIR: Path = Path()
 MODELS: List[str] = []
 ANSWER_NAME_TEMPLATE: str = "your_N_patched_answer.json"
 
-def load_json_array(path: Path) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} must be a JSON array")
-    return data
+SECURE_SUFFIX = "# Answer:\nSecure"
+
+def iter_json_array(path: str) -> Iterator[Any]:
+    # Stream the array so only the current record is held in memory
+    with open(path, "rb") as f:
+        if not f.read(64).lstrip().startswith(b"["):
+            raise ValueError(f"{path} must be a JSON array")
+        f.seek(0)
+        yield from ijson.items(f, "item", use_float=True)
 
 def is_secure_answer(answer_text: str) -> bool:
+    # Same test as the RQ4 scripts: the answer ends with the Secure verdict line
     if not isinstance(answer_text, str):
         return False
-    lines = [ln.replace("\r", "") for ln in answer_text.split("\n")]
-    last_idx = -1
-    for i, ln 在 enumerate(lines):
-        if ln.strip() == "# Answer:":
-            last_idx = i
-    if last_idx < 0 or last_idx + 1 >= len(lines):
-        return False
-    return lines[last_idx + 1].strip() == "Secure"
+    # Only the end of the answer decides; normalize a bounded tail instead of the whole text
+    tail = answer_text[-256:].replace("\r", "").rstrip()
+    if len(tail) < len(SECURE_SUFFIX) and len(answer_text) > 256:
+        # Mostly trailing whitespace: the verdict may start before the tail
+        tail = answer_text.replace("\r", "").rstrip()
+    return tail.endswith(SECURE_SUFFIX)
 
 def process_model_dir(model_dir: Path, answer_name_template: str) -> Dict[str, float]:
-    all_indices: Set[Any] = set()
-    index_has_secure: Dict[Any, bool] = {}
+    # (index, is_secure) per record as packed int64/uint8 columns while every index is an int;
+    # the first other index moves the tally to a dict keyed by the raw value
+    indices = array("q")
+    secure = array("B")
+    index_has_secure: Optional[Dict[Any, bool]] = None
+
+    # One listing of the directory replaces a stat per expected file
+    try:
+        with os.scandir(model_dir) as it:
+            files = {e.name: e.path for e in it if e.is_file()}
+    except OSError:
+        files = {}
 
     for i in range(1, 11):
         ans_name = f"{answer_name_template[:-5]}_{i}.json" 
-        ans_path = model_dir / ans_name
-        if not ans_path.exists():
+        ans_path = files.get(ans_name)
+        if ans_path is None:
             logger.warning(f"[{model_dir.name}] Missing file: {ans_name}, skipping i={i}")
             continue
+        # Per-file results are merged only once the whole file has been read,
+        # so a file that fails partway contributes nothing
+        file_indices: List[Any] = []
+        file_secure: List[bool] = []
         try:
-            arr = load_json_array(ans_path)
+            for pos, obj in enumerate(iter_json_array(ans_path)):
+                if not isinstance(obj, dict):
+                    logger.warning(f"[{model_dir.name}] {ans_name} element {pos} is not an object; skipping.")
+                    continue
+                if "index" not in obj:
+                    logger.warning(f"[{model_dir.name}] {ans_name} element {pos} missing 'index'; skipping.")
+                    continue
+                file_indices.append(obj["index"])
+                file_secure.append(is_secure_answer(obj.get("answer", "")))
         except Exception as e:
             logger.error(f"[{model_dir.name}] Failed to load {ans_name}: {e}", exc_info=True)
             continue
 
-        for pos, obj in enumerate(arr):
-            if not isinstance(obj, dict):
-                logger.warning(f"[{model_dir.name}] {ans_name} element {pos} is not an object; skipping.")
-                continue
-            if "index" not in obj:
-                logger.warning(f"[{model_dir.name}] {ans_name} element {pos} missing 'index'; skipping.")
-                continue
-            idx = obj["index"]
-            all_indices.add(idx)
-
-            ans = obj.get("answer", "")
-            if is_secure_answer(ans):
-                index_has_secure[idx] = True
+        if index_has_secure is None:
+            try:
+                packed = array("q", file_indices)
+            except (TypeError, OverflowError):
+                index_has_secure = {}
+                for k, v in zip(indices.tolist(), secure.tolist()):
+                    index_has_secure[k] = index_has_secure.get(k, False) or bool(v)
             else:
-                index_has_secure.setdefault(idx, False)
-
-    num = len(all_indices)
-    a = sum(1 for v in index_has_secure.values() if v is True)
+                indices.extend(packed)
+                secure.extend(array("B", file_secure))
+                continue
+        for idx, is_secure in zip(file_indices, file_secure):
+            index_has_secure[idx] = index_has_secure.get(idx, False) or is_secure
+
+    if index_has_secure is None:
+        idx_arr = np.frombuffer(indices, dtype=np.int64)
+        sec_mask = np.frombuffer(secure, dtype=np.uint8).astype(bool)
+        num = int(np.unique(idx_arr).size)
+        a = int(np.unique(idx_arr[sec_mask]).size)
+    else:
+        num = len(index_has_secure)
+        a = sum(1 for v in index_has_secure.values() if v)
     pct = (a / num * 100.0) if num > 0 else 0.0
 
     logger.info(f"[{model_dir.name}] num={num}, a={a}, pct={pct:.2f}%")
@@ -82,6 +116,7 @@ def main():
     parser.add_argument("--base_dir", type=str, required=True, help="Base directory path")
     parser.add_argument("--models", nargs='*', help="List of model names (folders)")
     parser.add_argument("--answer_name_template", type=str, required=True, help="Base name for answer files (without index)")  # 仅提供基本文件名
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
     args = parser.parse_args()
 
     BASE_DIR = Path(args.base_dir)
@@ -94,15 +129,21 @@ def main():
     if MODELS:
         model_dirs = [BASE_DIR / m for m in MODELS]
     else:
-        model_dirs = [p for p in BASE_DIR.iterdir() if p.is_dir()]
+        # DirEntry.is_dir() reuses the type from the directory listing instead of a stat per entry
+        with os.scandir(BASE_DIR) as it:
+            model_dirs = [Path(e.path) for e in it if e.is_dir()]
 
     if not model_dirs:
         logger.warning("No model directories to process.")
         return
 
+    # Model directories are independent, so scan them in parallel;
+    # map() keeps the results in model_dirs order for printing.
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        all_stats = list(ex.map(process_model_dir, model_dirs, repeat(args.answer_name_template)))  # 传递参数
+
     print("Model\tCoverage (a/num)\tPercent")
-    for md in model_dirs:
-        stats = process_model_dir(md, args.answer_name_template)  # 传递参数
+    for md, stats in zip(model_dirs, all_stats):
         num = int(stats["num"])
         a = int(stats["a"])
         pct = stats["pct"]
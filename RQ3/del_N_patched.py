@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
+import ijson
+import orjson
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, List, Tuple
 import argparse
 
 # ===== Logging =====
@@ -18,59 +20,106 @@ MODELS: List[str] = []
 N_PATCHED_CODE_NAME: str = "your_N_patched_code_{i}.json"  # Template for code file names
 N_PATCHED_ANSWER_NAME: str = "your_N_patched_answer_{i}.json"  # Template for answer file names
 
-def load_json_array(path: Path) -> List[Dict]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{path} must be a JSON array")
-    return data
-
-def save_json_array(path: Path, arr: List[Dict]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(arr, f, ensure_ascii=False, indent=2)
+# Placeholders in the code-file index list for elements without a usable "index"
+_NO_INDEX = object()
+_NOT_OBJECT = object()
+_SCALAR_EVENTS = {"null", "boolean", "integer", "double", "number", "string"}
+
+def load_code_indices(path: Path) -> List[Any]:
+    """Per-element "index" values of a code file, read from parser events without building the records."""
+    indices: List[Any] = []
+    with open(path, "rb") as f:
+        events = ijson.parse(f, use_float=True)
+        if next(events, (None, None, None))[1] != "start_array":
+            raise ValueError(f"{path} must be a JSON array")
+        builder = None
+        for prefix, event, value in events:
+            if builder is not None:
+                # Non-scalar index: rebuild just that value
+                builder.event(event, value)
+                if prefix == "item.index" and event in ("end_map", "end_array"):
+                    indices[-1] = builder.value
+                    builder = None
+            elif prefix == "item":
+                if event == "start_map":
+                    indices.append(_NO_INDEX)
+                elif event == "start_array" or event in _SCALAR_EVENTS:
+                    indices.append(_NOT_OBJECT)
+            elif prefix == "item.index":
+                if event in _SCALAR_EVENTS:
+                    indices[-1] = value
+                elif event in ("start_map", "start_array"):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+    return indices
 
 def inject_index_for_pair(code_path: Path, ans_path: Path) -> None:
-    code_arr = load_json_array(code_path)
-    ans_arr = load_json_array(ans_path)
-
-    min_length = min(len(code_arr), len(ans_arr))
+    code_indices = load_code_indices(code_path)
 
+    # The answer file is streamed into a temp file laid out like an
+    # OPT_INDENT_2 dump of the whole list, then swapped in, so only one answer record is held at a time
+    tmp_path = ans_path.with_name(ans_path.name + ".tmp")
     updated = 0
-    for idx in range(min_length):
-        code_obj = code_arr[idx]
-        ans_obj = ans_arr[idx]
-        try:
-            if not isinstance(code_obj, dict) or not isinstance(ans_obj, dict):
-                raise ValueError(f"Element at position {idx} is not an object in one of the files.")
-            if "index" not in code_obj:
-                logger.warning(f"Missing 'index' in {code_path.name} at position {idx}; skipping this element.")
-                continue
-            ans_obj["index"] = code_obj["index"]
-            updated += 1
-        except Exception as e:
-            logger.error(f"Error processing index at position {idx}: {e}")
-
-    save_json_array(ans_path, ans_arr)
+    num_ans = 0
+    try:
+        with open(ans_path, "rb") as src, open(tmp_path, "wb") as out:
+            if not src.read(64).lstrip().startswith(b"["):
+                raise ValueError(f"{ans_path} must be a JSON array")
+            src.seek(0)
+            out.write(b"[")
+            for idx, ans_obj in enumerate(ijson.items(src, "item", use_float=True)):
+                num_ans += 1
+                if idx < len(code_indices):
+                    index = code_indices[idx]
+                    try:
+                        if index is _NOT_OBJECT or not isinstance(ans_obj, dict):
+                            raise ValueError(f"Element at position {idx} is not an object in one of the files.")
+                        if index is _NO_INDEX:
+                            logger.warning(f"Missing 'index' in {code_path.name} at position {idx}; skipping this element.")
+                        else:
+                            ans_obj["index"] = index
+                            updated += 1
+                    except Exception as e:
+                        logger.error(f"Error processing index at position {idx}: {e}")
+                body = orjson.dumps(ans_obj, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+                out.write((b",\n  " if idx else b"\n  ") + body)
+            out.write(b"\n]" if num_ans else b"]")
+        os.replace(tmp_path, ans_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    min_length = min(len(code_indices), num_ans)
     logger.info(f"Updated {updated}/{min_length} items -> {ans_path}")
 
-def process_model_dir(model_dir: Path) -> None:
+def list_model_pairs(model_dir: Path, code_name_tpl: str, ans_name_tpl: str) -> List[Tuple[Path, Path, int]]:
+    # One listing of the directory replaces two stats per expected pair
+    try:
+        with os.scandir(model_dir) as it:
+            files = {e.name for e in it if e.is_file()}
+    except OSError:
+        files = set()
+
+    pairs = []
     for i in range(1, 10):  # Default length of patched files (temporary, can be adjusted later)
-        code_name = N_PATCHED_CODE_NAME.format(i=i)
-        ans_name  = N_PATCHED_ANSWER_NAME.format(i=i)
-        code_path = model_dir / code_name
-        ans_path  = model_dir / ans_name
+        code_name = code_name_tpl.format(i=i)
+        ans_name  = ans_name_tpl.format(i=i)
 
-        if not code_path.exists():
-            logger.warning(f"[{model_dir.name}] Missing: {code_path.name}, skipping i={i}.")
+        if code_name not in files:
+            logger.warning(f"[{model_dir.name}] Missing: {code_name}, skipping i={i}.")
             continue
-        if not ans_path.exists():
-            logger.warning(f"[{model_dir.name}] Missing: {ans_path.name}, skipping i={i}.")
+        if ans_name not in files:
+            logger.warning(f"[{model_dir.name}] Missing: {ans_name}, skipping i={i}.")
             continue
+        pairs.append((model_dir / code_name, model_dir / ans_name, i))
+    return pairs
 
-        try:
-            inject_index_for_pair(code_path, ans_path)
-        except Exception as e:
-            logger.error(f"[{model_dir.name}] Failed on i={i}: {e}", exc_info=True)
+def process_pair(pair: Tuple[Path, Path, int]) -> None:
+    code_path, ans_path, i = pair
+    try:
+        inject_index_for_pair(code_path, ans_path)
+    except Exception as e:
+        logger.error(f"[{code_path.parent.name}] Failed on i={i}: {e}", exc_info=True)
 
 def main():
     global BASE_DIR, MODELS, N_PATCHED_CODE_NAME, N_PATCHED_ANSWER_NAME
@@ -81,6 +130,7 @@ def main():
     parser.add_argument("--models", nargs='*', help="List of model names (folders)")
     parser.add_argument("--code_name", type=str, default="your_N_patched_code_{i}.json", help="Code filename template")
     parser.add_argument("--answer_name", type=str, default="your_N_patched_answer_{i}.json", help="Answer filename template")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
     args = parser.parse_args()
 
     BASE_DIR = Path(args.base_dir)
@@ -96,15 +146,22 @@ def main():
     if MODELS:
         model_dirs = [BASE_DIR / m for m in MODELS]
     else:
-        model_dirs = [p for p in BASE_DIR.iterdir() if p.is_dir()]
+        # DirEntry.is_dir() reuses the type from the directory listing instead of a stat per entry
+        with os.scandir(BASE_DIR) as it:
+            model_dirs = [Path(e.path) for e in it if e.is_dir()]
 
     if not model_dirs:
         logger.warning("No model directories found.")
         return
 
+    pairs = []
     for md in model_dirs:
         logger.info(f"Processing model dir: {md}")
-        process_model_dir(md)
+        pairs.extend(list_model_pairs(md, N_PATCHED_CODE_NAME, N_PATCHED_ANSWER_NAME))
+
+    # Every (code, answer) pair is rewritten independently, so spread them over processes
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        list(ex.map(process_pair, pairs))
 
     logger.info("Done.")
 
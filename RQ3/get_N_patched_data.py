@@ -1,5 +1,5 @@
 import os  
-import json  
+import orjson  
 from pathlib import Path  
 from typing import List, Dict, Any, Union  
 import argparse
@@ -37,17 +37,23 @@ def extract_patched_entries(items: List[Dict[str, Any]]) -> List[Dict[str, str]]
             outputs.append({"input": wrap_c_code_block(pc)})  
     return outputs  
 
-def process_model_dir(model_dir: Path) -> None:  
-    in_path = model_dir / INPUT_FILENAME  
-    out_path = model_dir / OUTPUT_FILENAME  
+def process_model_dir(model_dir: str) -> None:  
+    in_path = os.path.join(model_dir, INPUT_FILENAME)  
+    out_path = os.path.join(model_dir, OUTPUT_FILENAME)  
 
-    if not in_path.exists():  
+    # Open directly instead of checking exists() first; a missing file is the only skip case  
+    try:  
+        f = open(in_path, "rb")  
+    except FileNotFoundError:  
         print(f"[Skip] {in_path} does not exist. Skipping.")  
         return  
+    except OSError as e:  
+        print(f"[Error] Failed to read {in_path}: {e}")  
+        return  
 
     try:  
-        with open(in_path, "r", encoding="utf-8") as f:  
-            data = json.load(f)  
+        with f:  
+            data = orjson.loads(f.read())  
     except Exception as e:  
         print(f"[Error] Failed to read {in_path}: {e}")  
         return  
@@ -63,8 +69,8 @@ def process_model_dir(model_dir: Path) -> None:
         return  
 
     try:  
-        with open(out_path, "w", encoding="utf-8") as f:  
-            json.dump(out_recs, f, ensure_ascii=False, indent=2)  
+        with open(out_path, "wb") as f:  
+            f.write(orjson.dumps(out_recs, option=orjson.OPT_INDENT_2))  
         print(f"[OK] Generated {out_path} ({len(out_recs)} records)")  
     except Exception as e:  
         print(f"[Error] Failed to write {out_path}: {e}")  
@@ -87,9 +93,11 @@ def main():
         print(f"[Error] Base directory does not exist: {BASE_DIR}")  
         return  
 
-    for entry in BASE_DIR.iterdir():  
-        if entry.is_dir():  
-            process_model_dir(entry)  
+    # DirEntry.is_dir() reuses the type from the directory listing instead of a stat per entry  
+    with os.scandir(BASE_DIR) as it:  
+        model_dirs = [entry.path for entry in it if entry.is_dir()]  
+    for model_dir in model_dirs:  
+        process_model_dir(model_dir)  
 
 if __name__ == "__main__":  
     main()  
\ No newline at end of file
@@ -23,8 +23,9 @@ Writes aggregated list to result/full_patched.json.
 """
 from __future__ import annotations
 import argparse
-import json
+import orjson
 import re
+import sys
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -37,7 +38,7 @@ REASON_NUM_RE = re.compile(r"^(\s*)(\d+)[\).。:-]\s*(.*)")
 
 
 def load_json_list(path: Path):
-    data = json.loads(path.read_text(encoding='utf-8'))
+    data = orjson.loads(path.read_bytes())
     if not isinstance(data, list):
         raise ValueError(f"Expected list in {path}")
     return data
@@ -47,28 +48,31 @@ def parse_reasonings(answer_text: str) -> List[str]:
     if ANSWER_MARK not in answer_text:
         return []
     pre, _ = answer_text.split(ANSWER_MARK, 1)
-    lines = [l.rstrip() for l in pre.splitlines()]
+    match = REASON_NUM_RE.match
+    intern = sys.intern
     reasonings = []
     current = []
-    for line in lines:
-        m = REASON_NUM_RE.match(line)
+    # Parts are stored stripped and non-empty, so the joined text needs no strip
+    for line in pre.splitlines():
+        # A numbered line starts with a digit or whitespace; others skip the regex
+        head = line[:1]
+        m = match(line) if head.isdecimal() or head.isspace() else None
         if m:
             if current:
-                reasonings.append(" ".join(current).strip())
-                current = []
+                reasonings.append(intern(" ".join(current)))
             content = m.group(3).strip()
-            if content:
-                current.append(content)
-        else:
-            if current and line.strip():
-                current.append(line.strip())
+            current = [content] if content else []
+        elif current:
+            line = line.strip()
+            if line:
+                current.append(line)
     if current:
-        reasonings.append(" ".join(current).strip())
+        reasonings.append(intern(" ".join(current)))
     return reasonings
 
 
 def build_entries(base_dir: Path):
-    entries = []
+    # Yields entries one at a time; the counters are printed once the caller has consumed them all
     total_pairs = 0
     kept = 0
     skipped_no_secure = 0
@@ -103,13 +107,28 @@ def build_entries(base_dir: Path):
                 lines.append(f"{idx}. {r}")
             lines.append("# Answer:\nInsecure")  # Force Insecure per spec
             output_block = "\n".join(lines)
-            entries.append({
+            kept += 1
+            yield {
                 "input": origin_code,
                 "output": output_block
-            })
-            kept += 1
+            }
     print(f"Pairs processed={total_pairs} kept={kept} skipped_no_secure={skipped_no_secure} skipped_parse={skipped_parse}")
-    return entries
+
+
+def write_entries(out_path: Path, entries, pretty: bool) -> int:
+    """Write entries as one JSON array as they are produced; byte-identical to dumping the list."""
+    count = 0
+    with open(out_path, 'wb') as out:
+        out.write(b"[")
+        for entry in entries:
+            if pretty:
+                body = b"\n  " + orjson.dumps(entry, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+            else:
+                body = orjson.dumps(entry)
+            out.write(b"," + body if count else body)
+            count += 1
+        out.write(b"\n]" if pretty and count else b"]")
+    return count
 
 
 def main():
@@ -122,12 +141,8 @@ def main():
     base = Path(args.dir)
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    entries = build_entries(base)
-    if args.pretty:
-        out_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding='utf-8')
-    else:
-        out_path.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
-    print(f"Wrote {len(entries)} entries -> {out_path}")
+    n = write_entries(out_path, build_entries(base), args.pretty)
+    print(f"Wrote {n} entries -> {out_path}")
 
 if __name__ == '__main__':
     main()
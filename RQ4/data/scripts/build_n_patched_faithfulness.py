@@ -34,10 +34,12 @@ Usage:
 """
 from __future__ import annotations
 import argparse
-import json
+import orjson
 import re
+import sys
 from pathlib import Path
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import List, Dict, Any
 
 RANGE = range(1, 11)
@@ -50,7 +52,7 @@ SECURE_SUFFIX = "# Answer:\nSecure"
 
 
 def load_json_list(path: Path) -> List[Dict[str, Any]]:
-    data = json.loads(path.read_text(encoding='utf-8'))
+    data = orjson.loads(path.read_bytes())
     if not isinstance(data, list):
         raise ValueError(f"Expected list in {path}")
     return data
@@ -61,27 +63,28 @@ def parse_first_reasonings(answer_text: str) -> List[str]:
     if ANSWER_MARK not in answer_text:
         return []
     pre, _post = answer_text.split(ANSWER_MARK, 1)
-    lines = [l.rstrip() for l in pre.splitlines()]
+    match = REASON_NUM_RE.match
+    intern = sys.intern
     reasonings = []
     current = []
-    current_num = None
-    for line in lines:
-        m = REASON_NUM_RE.match(line)
+    # Parts are stored stripped and non-empty, so the joined text needs no strip
+    for line in pre.splitlines():
+        # A numbered line starts with a digit or whitespace; others skip the regex
+        head = line[:1]
+        m = match(line) if head.isdecimal() or head.isspace() else None
         if m:
             # start new reasoning item
             if current:
-                reasonings.append(" ".join(current).strip())
-                current = []
-            current_num = int(m.group(2))
+                reasonings.append(intern(" ".join(current)))
             content = m.group(3).strip()
-            if content:
-                current.append(content)
+            current = [content] if content else []
         else:
             # continuation of current reasoning
-            if current is not None and line.strip():
-                current.append(line.strip())
+            line = line.strip()
+            if line:
+                current.append(line)
     if current:
-        reasonings.append(" ".join(current).strip())
+        reasonings.append(intern(" ".join(current)))
     # Ensure ordering: they should already be in order 1..n; we can just return
     return reasonings
 
@@ -89,72 +92,77 @@ def parse_first_reasonings(answer_text: str) -> List[str]:
 def build_groups(code_items: List[Dict[str, Any]], answer_items: List[Dict[str, Any]]):
     if len(code_items) != len(answer_items):
         raise ValueError("Code and answer list length mismatch")
-    groups = defaultdict(list)
+    # One pass keeps just what process_group reads: each element's answer and the group's origin_code
+    groups = {}
     for code_obj, ans_obj in zip(code_items, answer_items):
         idx = code_obj.get('index')
         if idx is None:
             continue
-        # merge dictionaries to keep fields; answer from ans_obj overrides
-        merged = dict(code_obj)
-        for k, v in ans_obj.items():
-            if k == 'answer':
-                merged['answer'] = v  # 强制使用答案文件中的 answer
-            else:
-                merged.setdefault(k, v)
-        groups[idx].append(merged)
+        g = groups.get(idx)
+        if g is None:
+            g = groups[idx] = {"answers": [], "origin_code": None}
+        # 强制使用答案文件中的 answer; other fields prefer the code file
+        g["answers"].append((ans_obj['answer'] if 'answer' in ans_obj else code_obj.get('answer')) or '')
+        if g["origin_code"] is None:
+            oc = code_obj['origin_code'] if 'origin_code' in code_obj else ans_obj.get('origin_code')
+            if isinstance(oc, str) and oc.strip():
+                g["origin_code"] = oc
     return groups
 
 
-def process_group(idx: int, items: List[Dict[str, Any]]):
-    # Need the first element that contains an initial long answer with multiple reasoning lines.
-    # We'll assume items are already in order where each item corresponds to reasoning 1..n
-    # We detect reasoning count from the first item's 'answer'.
-    first_answer = items[0].get('answer') or ''
-    reasonings = parse_first_reasonings(first_answer)
+def process_group(idx: int, group: Dict[str, Any]):
+    # We'll assume answers are already in order where each one corresponds to reasoning 1..n
+    # We detect reasoning count from the first answer.
+    answers = group["answers"]
+    reasonings = parse_first_reasonings(answers[0])
     if not reasonings:
-        return None, {"index": idx, "group_size": len(items), "reasonings": 0, "match": False, "processed": False, "faithful_cnt": 0}
+        return None, {"index": idx, "group_size": len(answers), "reasonings": 0, "match": False, "processed": False, "faithful_cnt": 0}
     rcount = len(reasonings)
     # skip if group size less than reasoning count (semantic merges) per instruction.
-    if len(items) != rcount:
+    if len(answers) != rcount:
         # 仅当完全相等才处理；否则跳过
-        return None, {"index": idx, "group_size": len(items), "reasonings": rcount, "match": False, "processed": False, "faithful_cnt": 0}
-    usable = items  # size == rcount
-    faithful_texts = []
-    for pos, obj in enumerate(usable, start=1):
-        ans = obj.get('answer') or ''
-        # Determine classification by suffix
-        if ans.endswith(INSECURE_SUFFIX):
-            faithful_texts.append(reasonings[pos-1])
-        # If Secure -> unfaithful, ignore
-    # Acquire origin_code
-    origin_code = None
-    for obj in items:
-        oc = obj.get('origin_code')
-        if isinstance(oc, str) and oc.strip():
-            origin_code = oc
-            break
+        return None, {"index": idx, "group_size": len(answers), "reasonings": rcount, "match": False, "processed": False, "faithful_cnt": 0}
+    # Insecure -> faithful; Secure -> unfaithful, ignore
+    faithful_texts = [r for r, ans in zip(reasonings, answers) if ans.endswith(INSECURE_SUFFIX)]
+    origin_code = group["origin_code"]
     if not origin_code:
-        return None, {"index": idx, "group_size": len(items), "reasonings": rcount, "match": True, "processed": False, "faithful_cnt": 0}
-    return {"origin_code": origin_code, "faithful": faithful_texts}, {"index": idx, "group_size": len(items), "reasonings": rcount, "match": True, "processed": True, "faithful_cnt": len(faithful_texts)}
+        return None, {"index": idx, "group_size": len(answers), "reasonings": rcount, "match": True, "processed": False, "faithful_cnt": 0}
+    return {"origin_code": origin_code, "faithful": faithful_texts}, {"index": idx, "group_size": len(answers), "reasonings": rcount, "match": True, "processed": True, "faithful_cnt": len(faithful_texts)}
+
+
+def scan_pair(base_dir: Path, i: int):
+    """Group one (code, answer) file pair; returns None if either file is missing."""
+    code_path = base_dir / CODE_TEMPLATE.format(i=i)
+    ans_path = base_dir / ANSWER_TEMPLATE.format(i=i)
+    if not code_path.exists() or not ans_path.exists():
+        return None
+    code_items = load_json_list(code_path)
+    answer_items = load_json_list(ans_path)
+    groups = build_groups(code_items, answer_items)
+    results = []
+    scan_records = []
+    for idx, group in groups.items():
+        result, record = process_group(idx, group)
+        scan_records.append(record)
+        results.append(result)
+    return results, scan_records
 
 
-def aggregate(base_dir: Path):
+def aggregate(base_dir: Path, workers=None):
     all_groups = []  # raw
     scan_records = []
     processed_groups = 0
     skipped_groups = 0
-    for i in RANGE:
-        code_path = base_dir / CODE_TEMPLATE.format(i=i)
-        ans_path = base_dir / ANSWER_TEMPLATE.format(i=i)
-        if not code_path.exists() or not ans_path.exists():
+    # Each i is an independent file pair; map() returns them in RANGE order
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        per_pair = list(ex.map(scan_pair, repeat(base_dir), RANGE))
+    for i, scanned in zip(RANGE, per_pair):
+        if scanned is None:
             print(f"Missing pair for i={i}")
             continue
-        code_items = load_json_list(code_path)
-        answer_items = load_json_list(ans_path)
-        groups = build_groups(code_items, answer_items)
-        for idx, items in groups.items():
-            result, record = process_group(idx, items)
-            scan_records.append(record if record else {"index": idx, "group_size": len(items), "reasonings": 0, "match": False, "processed": False, "faithful_cnt": 0})
+        results, records = scanned
+        scan_records.extend(records)
+        for result in results:
             if result is None:
                 skipped_groups += 1
             else:
@@ -172,32 +180,47 @@ def aggregate(base_dir: Path):
     return all_groups
 
 
+def iter_final_entries(groups):
+    # 转换为最终输出格式
+    for g in groups:
+        faithful = g['faithful']
+        if not faithful:
+            continue  # 没有 faithful 原因则跳过
+        reasoning_lines = ["# Reasoning:"] + [f"{i}.{txt}" for i, txt in enumerate(faithful, start=1)] + ["# Answer:", "Insecure"]
+        output_str = "\n".join(reasoning_lines)
+        yield {"input": g['origin_code'], "output": output_str}
+
+
+def write_entries(out_path: Path, entries, pretty: bool) -> int:
+    """Write entries as one JSON array as they are produced; byte-identical to dumping the list."""
+    count = 0
+    with open(out_path, 'wb') as out:
+        out.write(b"[")
+        for entry in entries:
+            if pretty:
+                body = b"\n  " + orjson.dumps(entry, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+            else:
+                body = orjson.dumps(entry)
+            out.write(b"," + body if count else body)
+            count += 1
+        out.write(b"\n]" if pretty and count else b"]")
+    return count
+
+
 def main():
     ap = argparse.ArgumentParser(description="Build faithfulness dataset from N_patched files")
     ap.add_argument('--dir', default='/root/students/hebingyi/data/Qwen2.5-Coder-14B-Instruct/N_patched', help='N_patched directory')
     ap.add_argument('--out', default='/root/students/hebingyi/data/Qwen2.5-Coder-14B-Instruct/result/N_patched.json', help='Output JSON path')
     ap.add_argument('--pretty', action='store_true', help='Pretty-print JSON')
+    ap.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
     args = ap.parse_args()
  
     base = Path(args.dir)
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    groups = aggregate(base)
-    # 转换为最终输出格式
-    final_entries = []
-    for g in groups:
-        faithful = g['faithful']
-        if not faithful:
-            continue  # 没有 faithful 原因则跳过
-        reasoning_lines = ["# Reasoning:"] + [f"{i}.{txt}" for i, txt in enumerate(faithful, start=1)] + ["# Answer:", "Insecure"]
-        output_str = "\n".join(reasoning_lines)
-        final_entries.append({"input": g['origin_code'], "output": output_str})
-
-    if args.pretty:
-        out_path.write_text(json.dumps(final_entries, ensure_ascii=False, indent=2), encoding='utf-8')
-    else:
-        out_path.write_text(json.dumps(final_entries, ensure_ascii=False), encoding='utf-8')
-    print(f"Wrote {len(final_entries)} entries to {out_path}")
+    groups = aggregate(base, args.workers)
+    n = write_entries(out_path, iter_final_entries(groups), args.pretty)
+    print(f"Wrote {n} entries to {out_path}")
 
 if __name__ == '__main__':
     main()
@@ -10,9 +10,13 @@ Elements with missing 'answer' are always kept.
 """
 from __future__ import annotations
 import argparse
-import json
+import mmap
+import os
+import shutil
+import ijson
+import orjson
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
 
 RANGE = range(1, 11)
 FILENAME_TEMPLATE = "combined_get_origin_code_{i}.json"
@@ -20,60 +24,90 @@ TARGET_SUFFIX = "# Answer:\nSecure"
 
 
 def load_items(path: Path) -> List[Dict[str, Any]]:
-    text = path.read_text(encoding='utf-8').strip()
-    if not text:
-        return []
-    try:
-        data = json.loads(text)
-        if isinstance(data, list):
-            return data  # assume list of dicts
-        # If dict with key 'data'
-        if isinstance(data, dict) and isinstance(data.get('data'), list):
-            return data['data']
-        raise ValueError("Unsupported JSON structure (expected list or dict with data list)")
-    except json.JSONDecodeError:
-        # try json lines
-        items = []
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        # Parse from the mapped file; no decoded copy of the whole text is made
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
             try:
-                obj = json.loads(line)
-                items.append(obj)
-            except json.JSONDecodeError:
-                pass
-        return items
+                with memoryview(mm) as mv:
+                    data = orjson.loads(mv)
+                if isinstance(data, list):
+                    return data  # assume list of dicts
+                # If dict with key 'data'
+                if isinstance(data, dict) and isinstance(data.get('data'), list):
+                    return data['data']
+                raise ValueError("Unsupported JSON structure (expected list or dict with data list)")
+            except orjson.JSONDecodeError:
+                # try json lines
+                items = []
+                for line in iter(mm.readline, b''):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        obj = orjson.loads(line)
+                        items.append(obj)
+                    except orjson.JSONDecodeError:
+                        pass
+                return items
+
+
+def iter_items(path: Path) -> Iterator[Any]:
+    # JSON arrays are streamed record by record; other layouts fall back to load_items
+    with open(path, 'rb') as f:
+        if f.read(64).lstrip().startswith(b'['):
+            f.seek(0)
+            yield from ijson.items(f, 'item', use_float=True)
+            return
+    yield from load_items(path)
 
 
 def backup_once(path: Path):
     bak = path.with_suffix(path.suffix + '.bak')
     if not bak.exists():
-        bak.write_text(path.read_text(encoding='utf-8'), encoding='utf-8')
+        # Byte copy; the file never needs decoding to be backed up
+        shutil.copyfile(path, bak)
         print(f"Backup created: {bak.name}")
 
 
-def filter_items(items: List[Dict[str, Any]]):
-    kept = []
-    removed = []
-    for obj in items:
-        ans = obj.get('answer')
-        if isinstance(ans, str) and ans.endswith(TARGET_SUFFIX):
-            removed.append(obj)
-        else:
-            kept.append(obj)
-    return kept, removed
+def is_removed(obj: Dict[str, Any]) -> bool:
+    ans = obj.get('answer')
+    return isinstance(ans, str) and ans.endswith(TARGET_SUFFIX)
 
 
 def process_file(path: Path, apply: bool):
-    items = load_items(path)
-    kept, removed = filter_items(items)
-    print(f"{path.name}: total={len(items)} remove={len(removed)} keep={len(kept)}")
-    if apply and removed:
+    total = 0
+    removed = 0
+    # Kept records go straight to a temp file, laid out like an OPT_INDENT_2 dump of the list
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    out = open(tmp, 'wb') if apply else None
+    try:
+        for obj in iter_items(path):
+            total += 1
+            if is_removed(obj):
+                removed += 1
+                continue
+            if out is not None:
+                body = orjson.dumps(obj, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+                out.write((b",\n  " if total - removed > 1 else b"[\n  ") + body)
+        if out is not None:
+            out.write(b"\n]" if total - removed else b"[]")
+            out.close()
+    except BaseException:
+        if out is not None:
+            out.close()
+            tmp.unlink()
+        raise
+    print(f"{path.name}: total={total} remove={removed} keep={total - removed}")
+    if out is None:
+        return
+    if removed:
         backup_once(path)
-        # write pretty compact
-        path.write_text(json.dumps(kept, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
         print(f"Written filtered file: {path.name}")
+    else:
+        tmp.unlink()
 
 
 def main():
@@ -2,6 +2,9 @@
 """Merge N_patched.json and full_patched.json into data_base.json with instruction field."""
 from __future__ import annotations
 import json
+import os
+import ijson
+import orjson
 from pathlib import Path
 
 INSTRUCTION = """
@@ -88,22 +91,47 @@ Insecure
 """.strip()
 
 
-def load_list(path: Path):
+def check_list(path: Path) -> bool:
+    """True if path holds a JSON array to stream; False if it is missing or empty."""
     if not path.exists():
-        return []
-    data = json.loads(path.read_text(encoding='utf-8') or '[]')
-    if not isinstance(data, list):
+        return False
+    with open(path, 'rb') as f:
+        head = f.read(64)
+    if not head:
+        return False
+    if not head.lstrip().startswith(b'['):
         raise ValueError(f"Expected list in {path}")
-    return data
+    return True
 
 
-def normalize_entry(entry):
+def iter_list(path: Path):
+    # Entries are parsed one at a time instead of loading the whole array
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, 'item', use_float=True)
+
+
+# Every entry carries the same instruction, so its JSON text is built once per layout
+# and only input/output are serialized per entry
+_INSTRUCTION_JSON = orjson.dumps(INSTRUCTION)
+ENTRY_TEMPLATES = {
+    False: (b'{"instruction": ' + _INSTRUCTION_JSON + b', "input": ', b', "output": ', b'}'),
+    True: (b'{\n    "instruction": ' + _INSTRUCTION_JSON + b',\n    "input": ', b',\n    "output": ', b'\n  }'),
+}
+
+
+def _dump_value(value, pretty: bool) -> bytes:
+    if isinstance(value, str):
+        return orjson.dumps(value)
+    # Anything else keeps the stdlib layout (", " / ": " separators, float repr);
+    # nested values sit two levels deep inside the output list
+    text = json.dumps(value, ensure_ascii=False, indent=2 if pretty else None)
+    return (text.replace('\n', '\n    ') if pretty else text).encode('utf-8')
+
+
+def serialize_entry(entry, pretty: bool = False) -> bytes:
     # entry may already have input/output, we just add instruction
-    return {
-        'instruction': INSTRUCTION,
-        'input': entry.get('input', ''),
-        'output': entry.get('output', ''),
-    }
+    head, mid, tail = ENTRY_TEMPLATES[pretty]
+    return head + _dump_value(entry.get('input', ''), pretty) + mid + _dump_value(entry.get('output', ''), pretty) + tail
 
 
 def main():
@@ -118,17 +146,32 @@ def main():
     full_path = base_dir / 'full_patched.json'
     n_path = base_dir / 'N_patched.json'
 
-    full_list = load_list(full_path)
-    n_list = load_list(n_path)
-
-    merged = [normalize_entry(e) for e in full_list] + [normalize_entry(e) for e in n_list]
+    # Validate both sources before any output is written
+    sources = [p for p in (full_path, n_path) if check_list(p)]
+    counts = {full_path: 0, n_path: 0}
 
+    # Entries are written as they are read, framed to match an indent-2 (or compact) dump of the whole list;
+    # the temp file replaces the output only once both sources were read completely
     out_path = Path(args.out)
-    out_path.write_text(
-        json.dumps(merged, ensure_ascii=False, indent=2 if args.pretty else None),
-        encoding='utf-8'
-    )
-    print(f"Merged {len(full_list)} full_patched + {len(n_list)} N_patched -> {len(merged)} entries -> {out_path}")
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    pretty = args.pretty
+    sep = b',\n  ' if pretty else b', '
+    total = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(b'[')
+            for path in sources:
+                for e in iter_list(path):
+                    text = serialize_entry(e, pretty)
+                    f.write((sep if total else (b'\n  ' if pretty else b'')) + text)
+                    total += 1
+                    counts[path] += 1
+            f.write(b'\n]' if pretty and total else b']')
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    print(f"Merged {counts[full_path]} full_patched + {counts[n_path]} N_patched -> {total} entries -> {out_path}")
 
 if __name__ == '__main__':
     main()
@@ -12,8 +12,9 @@ Dry-run by default; use --apply to actually move.
 """
 from __future__ import annotations
 import argparse
+import os
 from pathlib import Path
-from typing import Iterable
+from typing import Dict, Iterable, Optional, Set
 
 RANGE = range(1, 11)
 
@@ -46,20 +47,35 @@ def organize(base_dir: Path, dry_run: bool = True) -> None:
 
     print(f"Planned moves: {len(planned)} files (existing + missing).")
 
+    # Every source sits directly in base_dir, so one listing replaces a stat per source
+    with os.scandir(base_dir) as it:
+        present = {entry.name for entry in it}
+
+    # Likewise one listing per target dir for the destinations; None marks a dir that does not exist yet
+    target_names: Dict[Path, Optional[Set[str]]] = {}
+    for d in needed_dirs:
+        try:
+            with os.scandir(d) as it:
+                target_names[d] = {entry.name for entry in it}
+        except FileNotFoundError:
+            target_names[d] = None
+        except NotADirectoryError:
+            target_names[d] = set()
+
     moves = []
     missing = []
     already_ok = 0
     for src, dst in planned:
-        if not src.exists():
+        if src.name not in present:
             missing.append(src)
             continue
-        if dst.exists():
+        if dst.name in (target_names[dst.parent] or ()):
             already_ok += 1
             continue
         moves.append((src, dst))
 
     for d in needed_dirs:
-        if not d.exists():
+        if target_names[d] is None:
             print(f"Will create dir: {d}")
 
     print(f"Files to move: {len(moves)} | Already in place: {already_ok} | Missing: {len(missing)}")
@@ -82,11 +98,11 @@ def organize(base_dir: Path, dry_run: bool = True) -> None:
     for d in needed_dirs:
         d.mkdir(parents=True, exist_ok=True)
 
+    # Target dirs all exist now, so each move is a single rename(2) on the path strings
     moved_count = 0
     for src, dst in moves:
         try:
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            src.rename(dst)
+            os.rename(os.fspath(src), os.fspath(dst))
             moved_count += 1
         except Exception as e:
             print(f"Failed to move {src.name}: {e}")
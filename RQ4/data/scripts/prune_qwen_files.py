@@ -12,6 +12,7 @@ A dry-run mode is available.
 """
 from __future__ import annotations
 import argparse
+import os
 from pathlib import Path
 
 KEEP_PATTERNS = [
@@ -23,35 +24,36 @@ KEEP_PATTERNS = [
 
 RANGE = range(1, 11)  # 1..10
 
-def build_whitelist(dir_path: Path) -> set[Path]:
-    keep: set[Path] = set()
-    for i in RANGE:
-        for pat in KEEP_PATTERNS:
-            keep.add(dir_path / pat.format(i=i))
-    return keep
+def build_whitelist() -> set[str]:
+    # Bare file names, matched against directory entry names
+    return {pat.format(i=i) for i in RANGE for pat in KEEP_PATTERNS}
 
 def prune(dir_path: Path, dry_run: bool = True) -> None:
     if not dir_path.is_dir():
         raise SystemExit(f"Directory not found: {dir_path}")
 
-    whitelist = build_whitelist(dir_path)
-    existing_whitelist = {p for p in whitelist if p.exists()}
+    whitelist = build_whitelist()
 
+    # One listing answers both which expected files exist and what to delete;
+    # DirEntry.is_dir() reuses the type from the listing
+    existing_whitelist = set()
     deletions = []
-    for child in dir_path.iterdir():
-        # Skip directories
-        if child.is_dir():
-            continue
-        if child in whitelist:
-            continue
-        deletions.append(child)
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if entry.name in whitelist:
+                existing_whitelist.add(entry.name)
+                continue
+            # Skip directories
+            if entry.is_dir():
+                continue
+            deletions.append(Path(entry.path))
 
     print(f"Whitelist expected {len(whitelist)} files. Present: {len(existing_whitelist)}")
     missing = whitelist - existing_whitelist
     if missing:
         print(f"Missing {len(missing)} expected files (showing first 20):")
-        for p in list(sorted(missing))[:20]:
-            print("  MISSING:", p.name)
+        for name in sorted(missing)[:20]:
+            print("  MISSING:", name)
 
     if not deletions:
         print("No files to delete.")
@@ -7,16 +7,23 @@ For i in 1..10:
   In full_patched/ compare:
     combined_get_origin_code_{i}.json      vs combined_full_patched_answer_{i}.json
 
-Assumptions: Each file is a JSON array OR a JSON lines file OR a plain JSON object with list under key 'data'. We count top-level element objects:
- - If the file parses to a list -> len(list)
- - If parses to a dict and has key 'data' that is a list -> len(dict['data'])
- - Else if parses to a dict -> count its top-level keys (fallback)
- - If it's JSON Lines (one JSON per line) we detect by failure of standard parse then iterate non-empty lines and parse individually.
+Assumptions: Each file is a JSON array OR a JSON lines file OR a plain JSON object with list under key 'data'. We count top-level element objects, sniffing the format first:
+ - If the file starts with '[' -> stream the array with ijson and count its items
+ - If the first non-blank line parses on its own and more content follows -> JSON Lines; count the non-empty lines that parse
+ - Otherwise parse the whole file with orjson:
+   - a list -> len(list)
+   - a dict with key 'data' that is a list -> len(dict['data'])
+   - else a dict -> count its top-level keys (fallback)
+   - unparsable -> count the non-empty lines that parse as JSON Lines
 Prints a summary table and warns mismatches.
 """
 from __future__ import annotations
-import json
+import ijson
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
+from typing import Iterable, Optional
 import argparse
 
 RANGE = range(1, 11)
@@ -26,28 +33,73 @@ PAIR_SPECS = [
     ("full_patched", "combined_get_origin_code_{i}.json", "combined_full_patched_answer_{i}.json"),
 ]
 
-def count_elements(path: Path) -> int:
-    if not path.exists():
-        return -1  # sentinel for missing
-    text = path.read_text(encoding='utf-8').strip()
-    if not text:
-        return 0
-    try:
-        data = json.loads(text)
-    except json.JSONDecodeError:
-        # Try JSON lines
-        count = 0
-        for line in text.splitlines():
+def count_array_items(path: Path) -> Optional[int]:
+    """Length of a top-level JSON array, counted while streaming; None if the file is not one."""
+    with open(path, 'rb') as f:
+        head = f.read(64).lstrip()
+        if not head.startswith(b'['):
+            return None
+        f.seek(0)
+        try:
+            return sum(1 for _ in ijson.items(f, 'item', use_float=True))
+        except ijson.JSONError:
+            # Malformed array: let the full parse below decide
+            return None
+
+def count_json_lines(lines: Iterable[bytes]) -> int:
+    count = 0
+    for chunk in lines:
+        # Same line breaks as bytes.splitlines() on the whole file
+        for line in chunk.splitlines():
             line = line.strip()
             if not line:
                 continue
             try:
-                json.loads(line)
+                orjson.loads(line)
                 count += 1
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # ignore bad line
                 pass
+    return count
+
+def sniff_json_lines(path: Path) -> Optional[int]:
+    """Count a JSON lines file while streaming it; None if the file is not recognisably one.
+
+    A first non-blank line that parses on its own but is followed by more content
+    cannot be a single JSON document, so the full parse is skipped.
+    """
+    with open(path, 'rb') as f:
+        for first in f:
+            if first.strip():
+                break
+        else:
+            return None
+        try:
+            orjson.loads(first.strip())
+        except orjson.JSONDecodeError:
+            return None
+        for line in f:
+            if line.strip():
+                return count_json_lines(chain((first, line), f))
+    return None
+
+def count_elements(path: Path) -> int:
+    if not path.exists():
+        return -1  # sentinel for missing
+    count = count_array_items(path)
+    if count is not None:
         return count
+    count = sniff_json_lines(path)
+    if count is not None:
+        return count
+    text = path.read_bytes().strip()
+    if not text:
+        return 0
+    try:
+        data = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Try JSON lines
+        return count_json_lines([text])
     # Structured parse
     if isinstance(data, list):
         return len(data)
@@ -61,35 +113,41 @@ def main():
     ap = argparse.ArgumentParser(description='Check paired JSON element counts for Qwen dataset')
     ap.add_argument('--base', default='/root/students/hebingyi/data/Mistral-7B-Instruct-v0.3', help='Base directory')
     ap.add_argument('--json', action='store_true', help='Output machine-readable JSON')
+    ap.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
     args = ap.parse_args()
 
     base = Path(args.base)
     rows = []
     mismatches = []
 
+    pairs = []
     for subdir, pat_a, pat_b in PAIR_SPECS:
         dir_path = base / subdir
         for i in RANGE:
-            f_a = dir_path / pat_a.format(i=i)
-            f_b = dir_path / pat_b.format(i=i)
-            c_a = count_elements(f_a)
-            c_b = count_elements(f_b)
-            equal = (c_a == c_b) and c_a >= 0
-            if not equal:
-                mismatches.append((subdir, i, c_a, c_b))
-            rows.append({
-                'group': subdir,
-                'i': i,
-                'file_a': f_a.name,
-                'count_a': c_a,
-                'file_b': f_b.name,
-                'count_b': c_b,
-                'equal': equal,
-            })
+            pairs.append((subdir, i, dir_path / pat_a.format(i=i), dir_path / pat_b.format(i=i)))
+
+    # Files are counted independently, so parse them in parallel; map() keeps pair order
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        counts = list(ex.map(count_elements, [f for _, _, f_a, f_b in pairs for f in (f_a, f_b)]))
+
+    for n, (subdir, i, f_a, f_b) in enumerate(pairs):
+        c_a = counts[2 * n]
+        c_b = counts[2 * n + 1]
+        equal = (c_a == c_b) and c_a >= 0
+        if not equal:
+            mismatches.append((subdir, i, c_a, c_b))
+        rows.append({
+            'group': subdir,
+            'i': i,
+            'file_a': f_a.name,
+            'count_a': c_a,
+            'file_b': f_b.name,
+            'count_b': c_b,
+            'equal': equal,
+        })
 
     if args.json:
-        import json as _json
-        print(_json.dumps({'rows': rows, 'mismatches': mismatches}, ensure_ascii=False, indent=2))
+        print(orjson.dumps({'rows': rows, 'mismatches': mismatches}, option=orjson.OPT_INDENT_2).decode())
         return
 
     # Human table
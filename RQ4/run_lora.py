@@ -4,13 +4,15 @@
 
 import os
 import re
-import json
+import asyncio
 import logging
 import argparse
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, Dict, Optional
 
+import httpx
 import requests
 import ijson
+import orjson
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 logger = logging.getLogger("runner-server-client")
@@ -21,6 +23,12 @@ API_KEY = "EMPTY"
 
 SERVED_MODEL_NAME = "your_lora_model_name"
 
+# Analyzed in place of rows whose input holds no code
+STUB_CODE = "int main(void){return 0;}"
+
+# Requests kept in flight at once, so vLLM's continuous batching always has work queued
+DEFAULT_CONCURRENCY = 64
+
 MODELS: Dict[str, str] = {
     "your_lora_model_name": SERVED_MODEL_NAME
 }
@@ -112,43 +120,55 @@ Output Example:
 # Answer:
 Insecure
 """ 
-
-def read_limited_json_array(path: str, limit: int) -> List[Dict]:
-    data = []
-    with open(path, "r", encoding="utf-8") as f:
+# Stripped once; every request carries the same system message
+_SYSTEM = SYSTEM_PROMPT.strip()
+# Everything around the code block in the user message is constant
+_USER_HEAD = "Here is the source code to analyze:\n```c\n"
+_USER_TAIL = (
+    "\n```\n"
+    "Follow the example format strictly and do not output any additional content.\n"
+    "# Reasoning: [Provide your detailed step-by-step analysis using numbered steps: 1., 2., 3., etc.]\n"
+    "# Answer:\n['Secure' or 'Insecure']"
+)
+
+def iter_json_array(path: str, limit: int) -> Iterator[Dict]:
+    # Rows are yielded as they are parsed, so the dataset is never held in memory
+    count = 0
+    with open(path, "rb") as f:
         for obj in ijson.items(f, "item"):
             if isinstance(obj, dict) and isinstance(obj.get("input"), str):
-                data.append(obj)
-                if len(data) >= limit: 
+                yield obj
+                count += 1
+                if count >= limit: 
                     break
-    return data
+
+# Fenced C block patterns for extract_code_from_input, compiled once
+_FENCED_C_NL = re.compile(r"```c\s*\n(.*?)\n```", re.DOTALL | re.IGNORECASE)
+_FENCED_C = re.compile(r"```c(.*?)```", re.DOTALL | re.IGNORECASE)
+# Line boundaries recognised by str.splitlines
+_LINE_BREAK_RE = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
 
 def extract_code_from_input(input_field: str) -> Optional[str]:
     if not isinstance(input_field, str):
         return None
     text = input_field.strip()
 
-    m = re.search(r"```c\s*\n(.*?)\n```", text, re.DOTALL | re.IGNORECASE)
-    if m and m.group(1).strip():
-        return m.group(1).strip()
+    m = _FENCED_C_NL.search(text)
+    code = m.group(1).strip() if m else ""
+    if code:
+        return code
 
-    m = re.search(r"```c(.*?)```", text, re.DOTALL | re.IGNORECASE)
-    if m and m.group(1).strip():
-        return m.group(1).strip()
+    m = _FENCED_C.search(text)
+    code = m.group(1).strip() if m else ""
+    if code:
+        return code
 
     return text if text else None
 
 def build_messages_from_code(code: str):
-    system = SYSTEM_PROMPT.strip()
-    user = (
-        "Here is the source code to analyze:\n"
-        "```c\n" + code.strip() + "\n```\n"
-        "Follow the example format strictly and do not output any additional content.\n"
-        "# Reasoning: [Provide your detailed step-by-step analysis using numbered steps: 1., 2., 3., etc.]\n"
-        "# Answer:\n['Secure' or 'Insecure']"
-    )
+    user = _USER_HEAD + code.strip() + _USER_TAIL
     return [
-        {"role": "system", "content": system},
+        {"role": "system", "content": _SYSTEM},
         {"role": "user", "content": user},
     ]
 
@@ -168,21 +188,27 @@ def validate_and_trim_strict(text: str) -> str:
         return ""
 
     head = t[:idx_ans].rstrip()
-    tail_lines = t[idx_ans:].splitlines()
 
-    ans_idx = None
-    for i, ln in enumerate(tail_lines):
-        if ln.strip() == "# Answer:":
-            ans_idx = i
+    # Walk the tail one line at a time (same breaks as str.splitlines) and stop at
+    # the word after the "# Answer:" line, instead of splitting the whole tail
+    header_lines = []
+    pos = idx_ans
+    while True:
+        m = _LINE_BREAK_RE.search(t, pos)
+        line = t[pos:m.start()] if m else t[pos:]
+        header_lines.append(line)
+        if m is None:
+            return ""
+        pos = m.end()
+        if line.strip() == "# Answer:":
             break
-    if ans_idx is None or ans_idx == len(tail_lines) - 1:
-        return ""
 
-    final_word = tail_lines[ans_idx + 1].strip()
+    m = _LINE_BREAK_RE.search(t, pos)
+    final_word = (t[pos:m.start()] if m else t[pos:]).strip()
     if final_word not in ("Secure", "Insecure"):
         return ""
 
-    answer_header = "\n".join(tail_lines[:ans_idx + 1])
+    answer_header = "\n".join(header_lines)
     trimmed = head + "\n" + answer_header + "\n" + final_word
     return trimmed
 
@@ -194,7 +220,7 @@ def smoke_test_server() -> bool:
         logger.exception("[SMOKE TEST] Health check failed")
         return False
 
-def chat_complete(messages, temperature=0.0, top_p=0.9, max_tokens=2048, use_lora=True) -> str:
+async def chat_complete(session: httpx.AsyncClient, messages, temperature=0.0, top_p=0.9, max_tokens=2048, use_lora=True) -> str:
     url = f"{SERVER_BASE_URL}/chat/completions"
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {API_KEY}"}
     body = {
@@ -206,27 +232,76 @@ def chat_complete(messages, temperature=0.0, top_p=0.9, max_tokens=2048, use_lor
     }
     if use_lora:
         body["lora_modules"] = ["my-lora"]
-    resp = requests.post(url, headers=headers, data=json.dumps(body), timeout=120)
+    resp = await session.post(url, headers=headers, content=orjson.dumps(body))
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
     return data["choices"][0]["message"]["content"] or ""
 
-def run_with_server(data: List[Dict], model_name: str):
-    results = [] 
-    for index, row 在 enumerate(data):
-        code = extract_code_from_input(row["input"]) or "int main(void){return 0;}"
-        messages = build_messages_from_code(code)
-        text = chat_complete(messages, temperature=0.0, top_p=0.9, max_tokens=2048, use_lora=True)
-        trimmed = validate_and_trim_strict(text)
-        
-        results.append({"answer": trimmed})
-
+async def run_with_server(data: Iterable[Dict], model_name: str, concurrency: int = DEFAULT_CONCURRENCY) -> int:
     out_dir = os.path.join(BASE_OUTPUT_DIR, model_name)
     os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path。join(out_dir, OUT_PUT)  # Combine output directory and output filename
-
-    with open(out_path, "w", encoding="utf-8") as f: 
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    out_path = os.path.join(out_dir, OUT_PUT)  # Combine output directory and output filename
+    # Answers are written as they complete, laid out like an indent-2 dump of the whole list;
+    # the file is renamed into place only once every row is done
+    part_path = out_path + ".part"
+
+    # Workers pull rows from the shared iterator only as they free up, so at most
+    # `concurrency` rows are in flight. Each row gets its index when it is taken;
+    # answers that finish early wait in `pending` until every earlier one is written.
+    rows = enumerate(data)
+    pending: Dict[int, Dict] = {}
+    written = 0
+
+    with open(part_path, "wb") as f:
+        def flush_ready():
+            nonlocal written
+            while written in pending:
+                text = orjson.dumps(pending.pop(written), option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+                f.write((b",\n  " if written else b"[\n  ") + text)
+                written += 1
+            f.flush()
+
+        async def answer_for(session: httpx.AsyncClient, code: str) -> str:
+            messages = build_messages_from_code(code)
+            text = await chat_complete(session, messages, temperature=0.0, top_p=0.9, max_tokens=2048, use_lora=True)
+            return validate_and_trim_strict(text)
+
+        # Rows without code all send the same stub prompt at temperature 0; ask once and share the answer
+        stub_answer: Optional[asyncio.Task] = None
+
+        async def worker(session: httpx.AsyncClient):
+            nonlocal stub_answer
+            for index, row in rows:
+                code = extract_code_from_input(row["input"])
+                if code is None:
+                    if stub_answer is None:
+                        stub_answer = asyncio.ensure_future(answer_for(session, STUB_CODE))
+                    trimmed = await stub_answer
+                else:
+                    trimmed = await answer_for(session, code)
+
+                pending[index] = {"answer": trimmed}
+                flush_ready()
+
+        # One pooled client for every row; 120s per request as before. HTTP/2 is only negotiated
+        # over https; the default plain-http endpoint uses pooled HTTP/1.1 keep-alive connections
+        limits = httpx.Limits(max_keepalive_connections=concurrency, max_connections=concurrency)
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=httpx.Timeout(120.0)) as session:
+            tasks = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # A failed row fails the whole run, as before; stop the other workers.
+                # Answers already written stay in the .part file.
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                logger.error(f"[{model_name}] {written} answers kept in {part_path}")
+                raise
+
+        f.write(b"\n]" if written else b"[]")
+    os.replace(part_path, out_path)
+    return written
 
 def main():
     global COMBINED_DATASET, OUT_PUT, BASE_OUTPUT_DIR  # Declare globals to modify those variables
@@ -236,6 +311,7 @@ def main():
     parser.add_argument("combined_dataset", type=str, help="Path to the combined dataset.")
     parser.add_argument("base_output_dir", type=str, help="Base output directory for results.")
     parser.add_argument("output_filename", type=str, help="Output filename for results.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of concurrent requests to the server")
     args = parser.parse_args()
 
     # Set the parameters from command-line arguments
@@ -247,16 +323,15 @@ def main():
         logger.error("Server health check failed. Please ensure vLLM serve is running.")
         return
 
-    logger.info(f"Loading dataset from {COMBINED_DATASET}")
-    data = read_limited_json_array(COMBINED_DATASET, float('inf')) 
-    logger.info(f"Loaded {len(data)} items")
-
     for model_key, served_name in MODELS.items():
         logger.info("=" * 80)
         logger.info(f"Model [{model_key}] via service name [{served_name}]")
         try:
-            run_with_server(data, model_key) 
-            logger.info(f"[{model_key}] Processed {len(data)} records.")
+            # Each model streams the dataset afresh
+            logger.info(f"Loading dataset from {COMBINED_DATASET}")
+            data = iter_json_array(COMBINED_DATASET, float('inf'))
+            processed = asyncio.run(run_with_server(data, model_key, args.concurrency))
+            logger.info(f"[{model_key}] Processed {processed} records.")
         except Exception as e:
             logger.exception(f"[{model_key}] Inference failed: {e}")
 